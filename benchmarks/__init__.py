@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Benchmarks for the memory store; run with `python -m benchmarks.memory_benchmark`."""
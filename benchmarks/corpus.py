@@ -0,0 +1,84 @@
+# benchmarks/corpus.py
+import datetime
+import random
+
+SUBJECTS = [
+    "the user", "my sister", "the project lead", "our landlord", "the dentist",
+    "a colleague", "the cat", "the band", "my manager", "the neighbour",
+    "the support team", "Alex", "Jordan", "the ritual circle", "the gardener",
+]
+VERBS = [
+    "mentioned", "asked about", "scheduled", "cancelled", "finished",
+    "forgot", "recommended", "complained about", "planned", "remembered",
+    "paid for", "fixed", "reviewed", "started", "postponed",
+]
+OBJECTS = [
+    "the quarterly report", "a trip to Lisbon", "the garden shed", "band practice",
+    "the server migration", "a birthday dinner", "the tarot reading", "the car repair",
+    "a python script", "the moon ritual", "the tax return", "the new synthesizer",
+    "a chess tournament", "the kitchen renovation", "the reading list",
+]
+DETAILS = [
+    "It was important to remember the deadline.",
+    "Everyone seemed happy with the result.",
+    "This is critical for next week.",
+    "The cost came to {number} dollars.",
+    "It took about {number} minutes.",
+    "Nobody was excited about it.",
+    "We should follow up on {weekday}.",
+    "The notes are in folder {number}.",
+    "I was a little sad about how it went.",
+    "Don't forget to bring the documents.",
+]
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Share of the corpus written to each collection; None is the general one
+MEMORY_TYPES = [(None, 0.4), ("episodic", 0.3), ("semantic", 0.2), ("procedural", 0.1)]
+
+
+def make_text(rng):
+    """One synthetic memory of two to four sentences."""
+    sentences = [f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(VERBS)} {rng.choice(OBJECTS)}."]
+    for _ in range(rng.randint(1, 3)):
+        sentences.append(rng.choice(DETAILS).format(number=rng.randint(1, 500),
+                                                    weekday=rng.choice(WEEKDAYS)))
+    return " ".join(sentences)
+
+
+def make_query(rng):
+    """A search string in the same vocabulary as the corpus."""
+    return f"{rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+
+
+def generate_corpus(size, seed=0, days=730, now=None):
+    """Yield (memory_type, text, metadata) for `size` synthetic memories.
+
+    Timestamps are spread uniformly over the last `days` days, so maintenance
+    jobs with 30/90 day cut-offs have a realistic share of old rows. The
+    output depends only on the arguments.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.datetime.now()
+    types = [memory_type for memory_type, _ in MEMORY_TYPES]
+    weights = [weight for _, weight in MEMORY_TYPES]
+
+    conversation_id = None
+    for i in range(size):
+        # Conversations run for a couple of dozen messages
+        if i % 24 == 0:
+            conversation_id = f"conv-{seed}-{i // 24}"
+        memory_type = rng.choices(types, weights)[0]
+        timestamp = now - datetime.timedelta(seconds=rng.uniform(0, days * 86400))
+        role = "user" if i % 2 == 0 else "ai"
+        metadata = {
+            "timestamp": timestamp.isoformat(),
+            "type": "message",
+            "role": role,
+            "user_id": "user" if role == "user" else "ai",
+            "conversation_id": conversation_id,
+            "thread_id": conversation_id,
+            "source": rng.choice(["chat", "voice", "import"]),
+        }
+        if memory_type:
+            metadata["memory_type"] = memory_type
+        yield memory_type, make_text(rng), metadata
@@ -0,0 +1,116 @@
+# benchmarks/embedding_benchmark.py
+"""Throughput and retrieval agreement of the embedding backends.
+
+Run from the repository root:
+
+    python -m benchmarks.embedding_benchmark --backends sentence-transformers onnx onnx-int8
+
+Every backend embeds the same synthetic corpus and query set. Recall@k is
+the share of the reference backend's exact top-k neighbours that a backend
+also ranks in its own top-k, which is what a switch of backend costs search.
+"""
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.corpus import generate_corpus, make_query
+from benchmarks.memory_benchmark import git_revision, summarize
+from embedding_backends import EMBEDDING_BACKENDS, create_embedding_function
+from embedding_registry import DEFAULT_EMBEDDING_MODEL
+
+
+def embed_all(function, texts, batch_size):
+    """Embed texts in batches, returning the matrix and per-batch latencies."""
+    vectors, latencies = [], []
+    for start in range(0, len(texts), batch_size):
+        batch_start = time.perf_counter()
+        vectors.extend(function(texts[start:start + batch_size]))
+        latencies.append(time.perf_counter() - batch_start)
+    return np.asarray(vectors, dtype=np.float32), latencies
+
+
+def top_k(queries, corpus, k):
+    """Exact top-k corpus rows per query by cosine similarity."""
+    similarities = queries @ corpus.T
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    return [set(row) for row in top.tolist()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare embedding backends on a synthetic corpus.")
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS,
+                        default=["sentence-transformers", "onnx-int8"])
+    parser.add_argument("--reference", choices=EMBEDDING_BACKENDS, default="sentence-transformers")
+    parser.add_argument("--model", default=DEFAULT_EMBEDDING_MODEL)
+    parser.add_argument("--corpus-size", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="embedding_benchmark.json")
+    args = parser.parse_args(argv)
+
+    texts = [text for _, text, _ in generate_corpus(args.corpus_size, seed=args.seed)]
+    rng = random.Random(args.seed)
+    queries = [make_query(rng) for _ in range(args.queries)]
+
+    backends = list(dict.fromkeys([args.reference] + args.backends))
+    embedded = {}
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started": datetime.datetime.now().isoformat(),
+            "model": args.model,
+            "reference": args.reference,
+            "corpus_size": args.corpus_size,
+            "queries": args.queries,
+            "batch_size": args.batch_size,
+            "k": args.k,
+            "python": sys.version.split()[0],
+        },
+        "results": {},
+    }
+
+    for backend in backends:
+        print(f"{backend}:", flush=True)
+        load_start = time.perf_counter()
+        function = create_embedding_function(backend, args.model)
+        function(["warm up"])  # Model load and first-forward costs stay out of the timings
+        load_s = time.perf_counter() - load_start
+
+        corpus_vectors, latencies = embed_all(function, texts, args.batch_size)
+        query_vectors, _ = embed_all(function, queries, args.batch_size)
+        embedded[backend] = (corpus_vectors, query_vectors)
+
+        stats = summarize(latencies, items=len(texts))
+        stats["load_s"] = round(load_s, 3)
+        stats["dimension"] = int(corpus_vectors.shape[1])
+        report["results"][backend] = stats
+        print(f"  {stats['items_per_s']} texts/s, batch p50 {stats['p50_ms']} ms, load {stats['load_s']} s",
+              flush=True)
+
+    reference_corpus, reference_queries = embedded[args.reference]
+    expected = top_k(reference_queries, reference_corpus, args.k)
+    for backend in backends:
+        corpus_vectors, query_vectors = embedded[backend]
+        found = top_k(query_vectors, corpus_vectors, args.k)
+        recall = float(np.mean([len(e & f) / args.k for e, f in zip(expected, found)]))
+        report["results"][backend][f"recall@{args.k}"] = round(recall, 4)
+        if corpus_vectors.shape == reference_corpus.shape:
+            # Rows are unit length, so this is the mean cosine to the reference vector
+            agreement = float(np.mean(np.sum(corpus_vectors * reference_corpus, axis=1)))
+            report["results"][backend]["cosine_to_reference"] = round(agreement, 4)
+        print(f"{backend}: recall@{args.k} {recall:.4f} vs {args.reference}")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# benchmarks/memory_benchmark.py
+"""Throughput and latency benchmarks for MemoryManager.
+
+Run from the repository root:
+
+    python -m benchmarks.memory_benchmark --sizes 10000 100000 --backend flat
+    python -m benchmarks.memory_benchmark --compare old.json --output new.json
+
+Each corpus size gets a fresh store in a temporary directory. Results are
+written as JSON so runs on different commits or backends can be compared.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.corpus import generate_corpus, make_query, make_text
+from embedding_backends import HashingEmbeddingFunction
+from memory import MemoryManager, VECTOR_BACKENDS
+from memory_consolidation import MemoryConsolidator
+from memory_importance import MemoryImportanceScorer
+from memory_pruning import MemoryPruner
+
+OPERATIONS = [
+    "bulk_insert", "add_memory", "search_memory", "search_all_memories",
+    "get_memory_by_id", "prune_old_memories", "prune_duplicate_memories",
+    "consolidate_old_memories",
+]
+
+
+_BATCH_SCORE_PROMPT = re.compile(r"JSON array of (\d+) numbers")
+
+
+class StubModel:
+    """Stands in for the LLM so maintenance jobs measure the store, not the model.
+
+    Answers like a well-behaved model would, so scoring takes its fast
+    path; `calls` counts requests so runs can show how many were needed.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate_text(self, prompt):
+        self.calls += 1
+        batch = _BATCH_SCORE_PROMPT.search(prompt)
+        if batch:
+            return json.dumps([50] * int(batch.group(1)))
+        if "numeric score" in prompt:
+            return "50"
+        # Consolidation summaries: the first memory of the batch
+        return prompt.split("\n\n", 2)[-1][:300]
+
+
+def summarize(latencies, items=None):
+    """Latency percentiles (ms) and throughput for a list of durations in seconds."""
+    latencies = np.asarray(latencies, dtype=np.float64)
+    total = float(latencies.sum())
+    items = len(latencies) if items is None else items
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "calls": len(latencies),
+        "items": items,
+        "total_s": round(total, 4),
+        "items_per_s": round(items / total, 2) if total else None,
+        "mean_ms": round(float(latencies.mean()) * 1000, 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def bench_size(size, args, embedding_function):
+    """Build a store of `size` memories and time every operation on it."""
+    directory = tempfile.mkdtemp(prefix=f"memory-bench-{size}-")
+    rng = random.Random(args.seed)
+    results = {}
+    try:
+        manager = MemoryManager(
+            persist_directory=directory,
+            embedding_batch_size=args.embedding_batch_size,
+            vector_backend=args.backend,
+            vector_dtype=args.dtype,
+            embedding_function=embedding_function
+        )
+
+        # Bulk insert, one timed call per batch and collection
+        latencies = []
+        general_ids = []
+        corpus = generate_corpus(size, seed=args.seed)
+        while True:
+            batch = list(itertools.islice(corpus, args.batch_size))
+            if not batch:
+                break
+            by_type = {}
+            for memory_type, text, metadata in batch:
+                texts, metadatas = by_type.setdefault(memory_type, ([], []))
+                texts.append(text)
+                metadatas.append(metadata)
+            for memory_type, (texts, metadatas) in by_type.items():
+                elapsed, ids = timed(manager.add_memories_bulk, texts, metadatas, memory_type=memory_type)
+                latencies.append(elapsed)
+                if memory_type is None and len(general_ids) < args.samples:
+                    general_ids.extend(ids[:args.samples - len(general_ids)])
+        results["bulk_insert"] = summarize(latencies, items=size)
+        print(f"  bulk_insert: {results['bulk_insert']['items_per_s']} rows/s", flush=True)
+
+        # Point operations, args.samples calls each
+        point_ops = {
+            "add_memory": lambda: manager.add_memory(make_text(rng), {"type": "message", "source": "bench"}),
+            "search_memory": lambda: manager.search_memory(make_query(rng), n_results=5),
+            "search_all_memories": lambda: manager.search_all_memories(make_query(rng), n_results=5),
+            "get_memory_by_id": lambda: manager.get_memory_by_id(rng.choice(general_ids)),
+        }
+        for name, operation in point_ops.items():
+            if name in args.skip or (name == "get_memory_by_id" and not general_ids):
+                continue
+            latencies = [timed(operation)[0] for _ in range(args.samples)]
+            results[name] = summarize(latencies)
+            print(f"  {name}: p50 {results[name]['p50_ms']} ms", flush=True)
+
+        # Maintenance jobs run once each; they are destructive, so they go last
+        model = StubModel()
+        pruner = MemoryPruner(manager, MemoryImportanceScorer(manager, model))
+        consolidator = MemoryConsolidator(manager, model)
+        typed_count = sum(collection.count() for collection in
+                          (manager.episodic_collection, manager.semantic_collection,
+                           manager.procedural_collection))
+        jobs = {
+            "prune_duplicate_memories": (pruner.prune_duplicate_memories, typed_count),
+            "prune_old_memories": (pruner.prune_old_memories, typed_count),
+            "consolidate_old_memories": (consolidator.consolidate_old_memories,
+                                         manager.episodic_collection.count()),
+        }
+        for name, (job, scanned) in jobs.items():
+            if name in args.skip:
+                continue
+            calls_before = model.calls
+            elapsed, message = timed(job)
+            results[name] = summarize([elapsed], items=scanned)
+            results[name]["result"] = message
+            results[name]["model_calls"] = model.calls - calls_before
+            print(f"  {name}: {round(elapsed, 2)} s ({message}, {results[name]['model_calls']} model calls)",
+                  flush=True)
+
+        manager.close()
+    finally:
+        if args.keep:
+            print(f"  store kept at {directory}")
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(baseline, current):
+    """Print p50 latency ratios of current over baseline."""
+    print(f"\nCompared with {baseline['meta'].get('revision')} ({baseline['meta'].get('backend')}):")
+    for size, operations in current["results"].items():
+        for name, stats in operations.items():
+            old = baseline["results"].get(size, {}).get(name)
+            if not old:
+                continue
+            p50 = stats["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("nan")
+            print(f"  {size:>8} {name:<26} p50 x{p50:.2f}  "
+                  f"({old['p50_ms']} -> {stats['p50_ms']} ms)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the memory store on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--backend", choices=VECTOR_BACKENDS, default="chroma")
+    parser.add_argument("--dtype", default="float32", help="flat backend storage dtype")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=1000, help="rows per bulk insert batch")
+    parser.add_argument("--embedding-batch-size", type=int, default=256)
+    parser.add_argument("--samples", type=int, default=200, help="calls per point operation")
+    parser.add_argument("--skip", nargs="*", default=[], choices=OPERATIONS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--keep", action="store_true", help="keep the generated stores")
+    args = parser.parse_args(argv)
+
+    embedding_function = HashingEmbeddingFunction(args.dimension)
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "started": datetime.datetime.now().isoformat(),
+            "backend": args.backend,
+            "dtype": args.dtype,
+            "dimension": args.dimension,
+            "batch_size": args.batch_size,
+            "samples": args.samples,
+            "seed": args.seed,
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": {},
+    }
+
+    for size in args.sizes:
+        print(f"{size} memories ({args.backend}):", flush=True)
+        report["results"][str(size)] = bench_size(size, args, embedding_function)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
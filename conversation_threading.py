@@ -7,8 +7,9 @@ from typing import List, Dict, Optional
 
 
 class ConversationThread:
-    def __init__(self, memory_manager, thread_id=None, title=None):
+    def __init__(self, memory_manager, thread_id=None, title=None, writer=None):
         self.memory_manager = memory_manager
+        self.writer = writer  # Optional MemoryWriteQueue for write-behind persistence
         self.thread_id = thread_id if thread_id else str(uuid.uuid4())
         self.title = title if title else f"Conversation {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}"
         self.messages = []
@@ -21,35 +22,100 @@ class ConversationThread:
         if not text:
             return None
 
-        message_id = str(uuid.uuid4())
-        timestamp = datetime.datetime.now().isoformat()
+        return self.add_messages([(text, role)])[0]
 
-        # Create message structure
-        message = {
-            "id": message_id,
-            "thread_id": self.thread_id,
-            "text": text,
-            "role": role,
-            "timestamp": timestamp
-        }
+    def add_messages(self, messages):
+        """Add several messages to the thread with a single memory write.
 
-        # Add to local cache
-        self.messages.append(message)
+        Each message is a (text, role) tuple, or (text, role, timestamp) when
+        importing history. Returns the new message ids in order, with None
+        for empty messages.
+        """
+        message_ids = []
+        texts, metadatas, ids = [], [], []
+        exchanges = []
 
-        # Update thread metadata
-        self.updated_at = timestamp
+        for entry in messages:
+            text, role = entry[0], entry[1]
+            if not text:
+                message_ids.append(None)
+                continue
 
-        # Store in memory system for persistence
-        if self.memory_manager:
-            metadata = {
+            message_id = str(uuid.uuid4())
+            timestamp = entry[2] if len(entry) > 2 else datetime.datetime.now().isoformat()
+
+            # Create message structure
+            message = {
+                "id": message_id,
+                "thread_id": self.thread_id,
+                "text": text,
+                "role": role,
+                "timestamp": timestamp
+            }
+
+            # An AI reply right after a user message completes an exchange
+            previous = self.messages[-1] if self.messages else None
+            if role == "ai" and previous and previous["role"] == "user":
+                exchanges.append((previous, message))
+
+            # Add to local cache
+            self.messages.append(message)
+
+            # Update thread metadata
+            self.updated_at = timestamp
+
+            texts.append(text)
+            metadatas.append({
                 "type": "message",
                 "role": role,
                 "thread_id": self.thread_id,
                 "timestamp": timestamp
-            }
-            self.memory_manager.add_memory(text, metadata, message_id)
+            })
+            ids.append(message_id)
+            message_ids.append(message_id)
+
+        # Store in memory system for persistence
+        if self.writer and texts:
+            self.writer.add_bulk(texts, metadatas, ids)
+        elif self.memory_manager and texts:
+            self.memory_manager.add_memories_bulk(texts, metadatas, ids)
 
-        return message_id
+        # Keep the recent history ring current, off the caller's thread if possible
+        if self.memory_manager:
+            for user_message, ai_message in exchanges:
+                if self.writer:
+                    self.writer.call(self._record_exchange, user_message, ai_message)
+                else:
+                    self._record_exchange(user_message, ai_message)
+
+        return message_ids
+
+    def _record_exchange(self, user_message, ai_message):
+        """Append one exchange to the history ring, with topics extracted."""
+        self.memory_manager.record_exchange(
+            user_message["text"], ai_message["text"],
+            user_id=user_message["id"], ai_id=ai_message["id"],
+            timestamp=ai_message["timestamp"],
+            metadata=self._exchange_metadata(user_message["text"])
+        )
+
+    def _exchange_metadata(self, user_text):
+        """History ring metadata for an exchange, with the user message's topic_N fields.
+
+        The stored messages are tagged later on the writer thread, but the
+        topic graph reads topics from the ring entry itself.
+        """
+        metadata = {"thread_id": self.thread_id}
+        if not self.memory_manager.auto_topics:
+            return metadata
+        try:
+            topics = self.memory_manager.topic_extractor.extract_topics(user_text)
+        except Exception as e:
+            print(f"Error extracting topics: {e}")
+            return metadata
+        for n, (topic, _) in enumerate(topics):
+            metadata[f"topic_{n}"] = topic
+        return metadata
 
     def get_messages(self, limit=None):
         """Get recent messages from thread"""
@@ -108,18 +174,28 @@ class ConversationThread:
         memory_id = f"thread:{self.thread_id}:metadata"
         content = f"Conversation thread: {self.title}"
 
-        self.memory_manager.add_memory(content, metadata, memory_id)
+        # Upsert so repeated saves overwrite the previous metadata
+        if self.writer:
+            self.writer.upsert(content, metadata, memory_id)
+        else:
+            self.memory_manager.add_memories_bulk([content], [metadata], [memory_id], upsert=True)
         return True
 
 
 class ThreadManager:
-    def __init__(self, memory_manager):
+    def __init__(self, memory_manager, writer=None):
         self.memory_manager = memory_manager
+        self.writer = writer
         self.active_threads = {}  # Cache of active threads
 
+    def _flush_writes(self):
+        """Make queued writes visible before reading threads back from memory"""
+        if self.writer:
+            self.writer.flush()
+
     def create_thread(self, title=None):
         """Create a new conversation thread"""
-        thread = ConversationThread(self.memory_manager, title=title)
+        thread = ConversationThread(self.memory_manager, title=title, writer=self.writer)
         self.active_threads[thread.thread_id] = thread
 
         # Save metadata immediately
@@ -139,6 +215,8 @@ class ThreadManager:
         if not self.memory_manager:
             return None
 
+        self._flush_writes()
+
         # First get thread metadata
         metadata_id = f"thread:{thread_id}:metadata"
         metadata_memory = self.memory_manager.get_memory_by_id(metadata_id)
@@ -150,18 +228,18 @@ class ThreadManager:
         thread = ConversationThread(
             self.memory_manager,
             thread_id=thread_id,
-            title=metadata_memory["metadata"].get("title")
+            title=metadata_memory["metadata"].get("title"),
+            writer=self.writer
         )
 
         # Update thread metadata from memory
         thread.created_at = metadata_memory["metadata"].get("created_at", thread.created_at)
         thread.updated_at = metadata_memory["metadata"].get("updated_at", thread.updated_at)
 
-        # Load messages for this thread
-        messages = self.memory_manager.search_memory(
-            query="",  # Empty query
-            n_results=100,  # Reasonable limit
-            metadata_filter={"thread_id": {"$eq": thread_id}, "type": {"$eq": "message"}}
+        # Load the most recent messages for this thread
+        messages = self.memory_manager.get_recent_memories(
+            limit=100,  # Reasonable limit
+            where={"$and": [{"thread_id": {"$eq": thread_id}}, {"type": {"$eq": "message"}}]}
         )
 
         # Sort by timestamp
@@ -195,11 +273,12 @@ class ThreadManager:
         if not self.memory_manager:
             return []
 
-        # Search for thread metadata entries
-        threads = self.memory_manager.search_memory(
-            query="Conversation thread",
-            n_results=limit,
-            metadata_filter={"type": {"$eq": "thread_metadata"}}
+        self._flush_writes()
+
+        # Get the most recently saved thread metadata entries
+        threads = self.memory_manager.get_recent_memories(
+            limit=limit,
+            where={"type": {"$eq": "thread_metadata"}}
         )
 
         # Format results
@@ -0,0 +1,271 @@
+# embedding_backends.py
+import os
+import re
+import shutil
+import tempfile
+import threading
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+DEFAULT_EMBEDDING_BACKEND = "sentence-transformers"
+
+# Backends create_embedding_function knows how to build
+EMBEDDING_BACKENDS = ("sentence-transformers", "hashing", "onnx", "onnx-int8")
+
+# Backends slow enough that an EmbeddingCache in front of them pays off
+CACHEABLE_BACKENDS = {"sentence-transformers", "onnx", "onnx-int8"}
+
+# Exported (and quantized) ONNX models are kept here between runs
+ONNX_MODEL_DIR = os.path.join(os.path.expanduser("~"), ".cache", "neo_rebis", "onnx")
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@contextmanager
+def _file_lock(path):
+    """Hold an exclusive lock on `path` across processes."""
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            import msvcrt
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after ten seconds; keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class HashingEmbeddingFunction:
+    """Deterministic, dependency-free embeddings using the hashing trick.
+
+    Lowercased word tokens (and word bigrams with ngrams=2) are hashed with
+    crc32 into `dimension` signed buckets, counts are log-scaled and rows
+    are L2-normalized. Texts that share words get a high cosine similarity.
+    There are no weights to download, and results are identical across
+    processes and machines, which suits tests and benchmarks.
+    """
+
+    def __init__(self, dimension=384, ngrams=1):
+        self.dimension = dimension
+        self.ngrams = ngrams
+
+    def _terms(self, text):
+        tokens = _TOKEN_PATTERN.findall(text.lower()) if text else []
+        if self.ngrams > 1:
+            tokens += [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens
+
+    def __call__(self, input):
+        vectors = np.zeros((len(input), self.dimension), dtype=np.float32)
+        terms = [self._terms(text) for text in input]
+        lengths = [len(text_terms) for text_terms in terms]
+        if sum(lengths):
+            # Hash each distinct term once, then scatter all counts in one call
+            vocabulary, inverse = np.unique(
+                np.array([term for text_terms in terms for term in text_terms], dtype=object),
+                return_inverse=True
+            )
+            digests = np.array([zlib.crc32(term.encode("utf-8")) for term in vocabulary], dtype=np.int64)
+            columns = (digests % self.dimension)[inverse]
+            signs = np.where(digests & 0x80000000, 1.0, -1.0).astype(np.float32)[inverse]
+            rows = np.repeat(np.arange(len(input)), lengths)
+            np.add.at(vectors, (rows, columns), signs)
+
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).tolist()
+
+
+class OnnxEmbeddingFunction:
+    """Sentence-transformer model run through ONNX Runtime on the CPU.
+
+    On first use the Hugging Face checkpoint is exported to ONNX once and,
+    with quantize=True, converted to int8 weights with dynamic quantization;
+    both files are kept under model_dir. Inference tokenizes with the fast
+    `tokenizers` library, runs one session call per batch and mean-pools
+    over the attention mask, then L2-normalizes like the MiniLM pipeline.
+    Needs onnxruntime and tokenizers, plus torch and transformers for the
+    one-off export.
+    """
+
+    def __init__(self, model_name, quantize=True, model_dir=ONNX_MODEL_DIR,
+                 max_length=256, num_threads=None):
+        self._configure(model_name, quantize, model_dir)
+        self.max_length = max_length
+
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = self._ensure_model()
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(self.directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+    def _configure(self, model_name, quantize, model_dir):
+        self.model_name = model_name
+        self.quantize = quantize
+        self.directory = os.path.join(model_dir, model_name.replace("/", "__"))
+
+    @classmethod
+    def prepare(cls, model_name, quantize=True, model_dir=ONNX_MODEL_DIR):
+        """Export the model if needed without loading it; returns its path."""
+        exporter = cls.__new__(cls)
+        exporter._configure(model_name, quantize, model_dir)
+        return exporter._ensure_model()
+
+    @property
+    def hub_id(self):
+        # Bare names like all-MiniLM-L6-v2 live under the sentence-transformers org
+        return self.model_name if "/" in self.model_name else f"sentence-transformers/{self.model_name}"
+
+    # Serializes exports between threads; _file_lock covers other processes
+    _export_lock = threading.Lock()
+
+    def model_path(self):
+        return os.path.join(self.directory, "model.int8.onnx" if self.quantize else "model.onnx")
+
+    def _ensure_model(self):
+        """Export (and quantize) the model unless a previous run already did.
+
+        Other processes sharing model_dir (embedding pool workers, a second
+        app instance) wait on a lock file and reuse the finished export.
+        """
+        fp32_path = os.path.join(self.directory, "model.onnx")
+        target = self.model_path()
+        tokenizer_path = os.path.join(self.directory, "tokenizer.json")
+        if os.path.exists(target) and os.path.exists(tokenizer_path):
+            return target
+        os.makedirs(self.directory, exist_ok=True)
+        with self._export_lock, _file_lock(os.path.join(self.directory, ".export.lock")):
+            if os.path.exists(target) and os.path.exists(tokenizer_path):
+                return target
+            if not (os.path.exists(fp32_path) and os.path.exists(tokenizer_path)):
+                self._export(fp32_path)
+            if self.quantize:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                tmp_path = self._temp_path(target)
+                try:
+                    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+                    os.replace(tmp_path, target)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            return target
+
+    def _temp_path(self, path):
+        """Unique scratch file next to `path`, so os.replace stays atomic."""
+        handle, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                                            dir=self.directory)
+        os.close(handle)
+        return tmp_path
+
+    def _export(self, path):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(self.hub_id)
+        model = AutoModel.from_pretrained(self.hub_id).eval()
+
+        # Save the tokenizer into a scratch dir and move the files in one by
+        # one, so a reader never sees a half-written tokenizer.json
+        tokenizer_dir = tempfile.mkdtemp(prefix=".tokenizer.", dir=self.directory)
+        try:
+            tokenizer.save_pretrained(tokenizer_dir)
+            for name in os.listdir(tokenizer_dir):
+                os.replace(os.path.join(tokenizer_dir, name), os.path.join(self.directory, name))
+        finally:
+            shutil.rmtree(tokenizer_dir, ignore_errors=True)
+
+        sample = tokenizer(["warm up"], return_tensors="pt")
+        names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        tmp_path = self._temp_path(path)
+        try:
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    tuple(sample[name] for name in names),
+                    tmp_path,
+                    input_names=names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14
+                )
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __call__(self, input):
+        if not input:
+            return []
+        encodings = self.tokenizer.encode_batch(list(input))
+        ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+        hidden = self.session.run(None, {name: value for name, value in feeds.items()
+                                         if name in self.input_names})[0]
+
+        # Mean pooling over real tokens, then unit length
+        weights = mask[:, :, None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (pooled / norms).tolist()
+
+
+def create_embedding_function(backend=DEFAULT_EMBEDDING_BACKEND, model_name=None, num_threads=None):
+    """Build the raw embedding function for a backend.
+
+    model_name names the sentence-transformer model and is ignored by the
+    hashing backend. "onnx" runs that model through ONNX Runtime and
+    "onnx-int8" runs its int8-quantized export. num_threads caps ONNX
+    Runtime's intra-op threads; torch is capped by the caller.
+    """
+    if backend == "sentence-transformers":
+        from chromadb.utils import embedding_functions
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+    if backend == "hashing":
+        return HashingEmbeddingFunction()
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddingFunction(model_name, quantize=backend == "onnx-int8", num_threads=num_threads)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def prepare_embedding_function(backend=DEFAULT_EMBEDDING_BACKEND, model_name=None):
+    """Do a backend's one-off setup without building the function.
+
+    For the ONNX backends this is the export, so processes that start
+    afterwards (embedding pool workers) only load the finished files.
+    """
+    if backend in ("onnx", "onnx-int8"):
+        OnnxEmbeddingFunction.prepare(model_name, quantize=backend == "onnx-int8")
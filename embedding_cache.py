@@ -0,0 +1,200 @@
+# embedding_cache.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def text_digest(text):
+    """Content hash used as the cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class DiskEmbeddingStore:
+    """Append-only on-disk embedding store read through a memory map.
+
+    Vectors live in `<name>.f32` as consecutive float32 rows and their keys
+    in `<name>.keys`, one hex digest per line, so row i belongs to line i.
+    The vector dimension is recorded in `<name>.json`.
+    """
+
+    def __init__(self, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, f"{name}.f32")
+        self.keys_path = os.path.join(directory, f"{name}.keys")
+        self.meta_path = os.path.join(directory, f"{name}.json")
+        self.dimension = None
+        self._rows = {}  # digest -> row
+        self._map = None
+        self._load()
+
+    def _load(self):
+        if not all(os.path.exists(p) for p in (self.meta_path, self.keys_path, self.vectors_path)):
+            return
+
+        try:
+            with open(self.meta_path, "r") as f:
+                self.dimension = json.load(f)["dimension"]
+        except Exception as e:
+            print(f"Error reading embedding cache metadata: {e}")
+            return
+
+        with open(self.keys_path, "r") as f:
+            keys = [line.strip() for line in f if line.strip()]
+        size = os.path.getsize(self.vectors_path)
+        row_bytes = self.dimension * 4
+
+        # A crash between the two appends can leave one file longer than the
+        # other; cut both back to the rows they agree on so appends line up
+        row_count = min(len(keys), size // row_bytes)
+        if row_count != len(keys) or row_count * row_bytes != size:
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(row_count * row_bytes)
+            with open(self.keys_path, "w") as f:
+                f.write("".join(f"{key}\n" for key in keys[:row_count]))
+
+        self._rows = {key: row for row, key in enumerate(keys[:row_count])}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def get(self, digest):
+        """Return the stored vector for a digest, or None."""
+        row = self._rows.get(digest)
+        if row is None:
+            return None
+        if self._map is None or row >= self._map.shape[0]:
+            self._remap()
+        return np.array(self._map[row])
+
+    def _remap(self):
+        rows = len(self._rows)
+        self._map = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                              shape=(rows, self.dimension))
+
+    def put_many(self, digests, vectors):
+        """Append vectors for digests that are not stored yet."""
+        new = [(d, v) for d, v in zip(digests, vectors) if d not in self._rows]
+        if not new:
+            return
+
+        if self.dimension is None:
+            self.dimension = len(new[0][1])
+            with open(self.meta_path, "w") as f:
+                json.dump({"dimension": self.dimension}, f)
+            # Start the data files fresh to match the new metadata
+            open(self.vectors_path, "wb").close()
+            open(self.keys_path, "w").close()
+        new = [(d, v) for d, v in new if len(v) == self.dimension]
+        if not new:
+            return
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(np.asarray([v for _, v in new], dtype=np.float32).tobytes())
+        with open(self.keys_path, "a") as f:
+            f.write("".join(f"{d}\n" for d, _ in new))
+
+        start = len(self._rows)
+        for offset, (digest, _) in enumerate(new):
+            self._rows[digest] = start + offset
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by (model name, sha256(text)).
+
+    A bounded in-memory LRU sits in front of an optional memory-mapped disk
+    tier; vectors found on disk are promoted into the LRU.
+    """
+
+    def __init__(self, model_name, max_entries=10000, cache_dir=None):
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (model name, digest) -> float32 vector
+        self._lock = threading.Lock()
+        self._disk = None
+        if cache_dir:
+            safe_name = model_name.replace("/", "_")
+            self._disk = DiskEmbeddingStore(cache_dir, safe_name)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def embed(self, texts, embed_function):
+        """Embed texts, only calling embed_function for cache misses.
+
+        Returns plain lists of floats in input order, which every Chroma
+        version accepts.
+        """
+        keys = [(self.model_name, text_digest(text)) for text in texts]
+        results = [None] * len(texts)
+        missing = {}  # key -> indexes waiting on it
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._lookup(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    results[i] = vector
+
+        if missing:
+            # Duplicate texts within one call are only embedded once
+            miss_keys = list(missing)
+            miss_texts = [texts[missing[key][0]] for key in miss_keys]
+            vectors = [np.asarray(v, dtype=np.float32) for v in embed_function(miss_texts)]
+
+            with self._lock:
+                for key, vector in zip(miss_keys, vectors):
+                    self._store(key, vector)
+                    for i in missing[key]:
+                        results[i] = vector
+                if self._disk is not None:
+                    self._disk.put_many([key[1] for key in miss_keys], vectors)
+
+        return [vector.tolist() for vector in results]
+
+    def _lookup(self, key):
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+        if self._disk is not None:
+            vector = self._disk.get(key[1])
+            if vector is not None:
+                self._store(key, vector)
+                self.disk_hits += 1
+                return vector
+
+        self.misses += 1
+        return None
+
+    def _store(self, key, vector):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop the in-memory tier (the disk tier is kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "disk_entries": len(self._disk) if self._disk is not None else 0
+            }
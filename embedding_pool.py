@@ -0,0 +1,121 @@
+# embedding_pool.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+
+import numpy as np
+
+# Set in each worker process by _init_worker
+_worker_function = None
+
+
+# Read by OpenMP / BLAS when they load, which in a spawned worker is while
+# this module's numpy import runs, before _init_worker is called
+_THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+@contextmanager
+def _worker_environment(threads):
+    """Temporarily set the thread limits that spawned workers inherit."""
+    overrides = {variable: str(threads) for variable in _THREAD_VARIABLES}
+    overrides["TOKENIZERS_PARALLELISM"] = "false"
+    saved = {variable: os.environ.get(variable) for variable in overrides}
+    os.environ.update(overrides)
+    try:
+        yield
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def _init_worker(backend, model_name, threads):
+    """Build this worker's own model, limited to `threads` math threads.
+
+    The environment variables were inherited from the parent; torch only
+    needs telling explicitly.
+    """
+    global _worker_function
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        torch.set_num_interop_threads(1)
+    except Exception:
+        pass  # Backends without torch (onnx, hashing) are covered by the env vars
+
+    from embedding_backends import create_embedding_function
+    _worker_function = create_embedding_function(backend, model_name, num_threads=threads)
+
+
+def _started():
+    return None
+
+
+def _embed_shard(texts):
+    # float32 arrays pickle far smaller than nested lists of floats
+    return np.asarray(_worker_function(texts), dtype=np.float32)
+
+
+class EmbeddingWorkerPool:
+    """Shards large embedding batches across worker processes.
+
+    Every worker loads its own copy of the model, capped at
+    threads_per_worker math threads so the workers do not oversubscribe the
+    cores. Processes start with the "spawn" method on first use and keep
+    their model for the life of the pool. Batches smaller than min_batch
+    are not worth the IPC and should be embedded in-process.
+    """
+
+    def __init__(self, backend, model_name, workers=None, threads_per_worker=None,
+                 min_batch=512, shard_size=256):
+        cores = os.cpu_count() or 1
+        self.backend = backend
+        self.model_name = model_name
+        self.workers = workers or max(1, cores - 1)
+        self.threads_per_worker = threads_per_worker or max(1, cores // self.workers)
+        self.min_batch = min_batch
+        self.shard_size = shard_size
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Export once here rather than racing an export in every worker
+                from embedding_backends import prepare_embedding_function
+                prepare_embedding_function(self.backend, self.model_name)
+                with _worker_environment(self.threads_per_worker):
+                    executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=_init_worker,
+                        initargs=(self.backend, self.model_name, self.threads_per_worker)
+                    )
+                    # Workers start lazily; start them all while the limits are in place
+                    wait([executor.submit(_started) for _ in range(self.workers)])
+                self._executor = executor
+            return self._executor
+
+    def embed(self, texts):
+        """Embed texts across the workers, returning lists of floats in input order."""
+        if not texts:
+            return []
+        texts = list(texts)
+        # At least one shard per worker so small-but-eligible batches still spread out
+        shard_size = min(self.shard_size, -(-len(texts) // self.workers))
+        shards = [texts[i:i + shard_size] for i in range(0, len(texts), shard_size)]
+        embeddings = []
+        for vectors in self._get_executor().map(_embed_shard, shards):
+            embeddings.extend(vectors.tolist())
+        return embeddings
+
+    def close(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
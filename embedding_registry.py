@@ -0,0 +1,242 @@
+# embedding_registry.py
+import os
+import threading
+
+from embedding_backends import CACHEABLE_BACKENDS, DEFAULT_EMBEDDING_BACKEND, create_embedding_function
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Dummy batch for warm-up; two lengths so padding paths are exercised too
+WARM_UP_TEXTS = [
+    "warm up",
+    "A somewhat longer sentence, so the first forward pass also sees padding.",
+]
+
+
+class SharedEmbeddingFunction:
+    """Thread-safe, lazily loaded embedding function.
+
+    One instance per backend and model is shared by every MemoryManager in
+    the process. The model is only built on the first call, and calls are
+    serialized so concurrent searches and writes can safely use it.
+    """
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, cache=None,
+                 backend=DEFAULT_EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        self.cache = cache  # Optional EmbeddingCache consulted before the model
+        self._function = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        """Whether the underlying model has been loaded yet."""
+        return self._function is not None
+
+    def load(self):
+        """Load the underlying model if it is not loaded yet."""
+        with self._lock:
+            return self._load_locked()
+
+    def _load_locked(self):
+        if self._function is None:
+            self._function = create_embedding_function(self.backend, self.model_name)
+        return self._function
+
+    def warm_up(self, texts=None):
+        """Load the model and run one uncached forward pass.
+
+        Bypasses the cache on purpose: a cache hit would skip exactly the
+        load and first-forward costs this is meant to pay. Returns the
+        embeddings of the dummy batch.
+        """
+        return self._embed_uncached(texts or WARM_UP_TEXTS)
+
+    def unload(self):
+        """Drop the underlying model so its memory can be reclaimed."""
+        with self._lock:
+            self._function = None
+
+    def cache_stats(self):
+        """Return the embedding cache counters, or None without a cache."""
+        return self.cache.stats() if self.cache else None
+
+    def _embed_uncached(self, input):
+        with self._lock:
+            return self._load_locked()(input)
+
+    def __call__(self, input):
+        if self.cache is None:
+            return self._embed_uncached(input)
+        return self.cache.embed(input, self._embed_uncached)
+
+
+def _close_client(client):
+    """Stop a Chroma client's system so its SQLite handles are closed."""
+    try:
+        if hasattr(client, "close"):
+            client.close()
+            return
+        # Older chromadb has no close(); drop just this directory's cached system
+        systems = getattr(client, "_identifier_to_system", None)
+        system = systems.pop(getattr(client, "_identifier", None), None) if systems else None
+        if system is not None:
+            system.stop()
+    except Exception as e:
+        print(f"Error closing Chroma client: {e}")
+
+
+class EmbeddingRegistry:
+    """Process-wide registry of embedding functions, Chroma clients and stores.
+
+    Embedding functions are shared per backend and model name and clients
+    per persist directory, each with a reference count so the last release
+    frees them. Other per-directory state (flat vector stores, side
+    indexes, maintenance files) is shared the same way through
+    acquire_resource, because two in-memory copies of one file would
+    overwrite each other.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._functions = {}  # (backend, model name) -> [function, refcount]
+        self._clients = {}  # absolute persist directory -> [client, refcount]
+        self._resources = {}  # key -> [resource, refcount, finalize]
+
+    def acquire_embedding_function(self, model_name=DEFAULT_EMBEDDING_MODEL,
+                                   cache_size=10000, cache_dir=None,
+                                   backend=DEFAULT_EMBEDDING_BACKEND):
+        """Get the shared embedding function for a backend and model, adding a reference.
+
+        The cache settings only apply when the function is first created;
+        a cache_size of 0 disables caching, and backends cheaper than a
+        cache lookup (hashing) never get one.
+        """
+        key = (backend, model_name)
+        with self._lock:
+            entry = self._functions.get(key)
+            if entry is None:
+                cache = None
+                if cache_size and backend in CACHEABLE_BACKENDS:
+                    from embedding_cache import EmbeddingCache
+                    # Backends disagree slightly on vectors, so each gets its own cache
+                    cache_name = model_name if backend == DEFAULT_EMBEDDING_BACKEND else f"{model_name}.{backend}"
+                    cache = EmbeddingCache(cache_name, max_entries=cache_size, cache_dir=cache_dir)
+                entry = [SharedEmbeddingFunction(model_name, cache, backend), 0]
+                self._functions[key] = entry
+            entry[1] += 1
+            return entry[0]
+
+    def release_embedding_function(self, model_name=DEFAULT_EMBEDDING_MODEL,
+                                   backend=DEFAULT_EMBEDDING_BACKEND):
+        """Drop a reference to an embedding function, unloading it at zero."""
+        key = (backend, model_name)
+        with self._lock:
+            entry = self._functions.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._functions[key]
+                entry[0].unload()
+
+    def acquire_client(self, persist_directory):
+        """Get the shared Chroma client for a directory, adding a reference."""
+        path = os.path.abspath(persist_directory)
+        with self._lock:
+            entry = self._clients.get(path)
+            if entry is None:
+                import chromadb
+                os.makedirs(path, exist_ok=True)
+                entry = [chromadb.PersistentClient(path=path), 0]
+                self._clients[path] = entry
+            entry[1] += 1
+            return entry[0]
+
+    def release_client(self, persist_directory):
+        """Drop a reference to a Chroma client, closing it at zero."""
+        path = os.path.abspath(persist_directory)
+        with self._lock:
+            entry = self._clients.get(path)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self._clients[path]
+                _close_client(entry[0])
+
+    def acquire_resource(self, key, factory, finalize=None):
+        """Get the shared resource for a key, creating it with factory() on first use.
+
+        Keys should include the absolute path the resource lives at.
+        finalize(resource) runs when the last reference is released.
+        Returns (resource, created).
+        """
+        with self._lock:
+            entry = self._resources.get(key)
+            created = entry is None
+            if created:
+                entry = [factory(), 0, finalize]
+                self._resources[key] = entry
+            entry[1] += 1
+            return entry[0], created
+
+    def release_resource(self, key):
+        """Drop a reference to a shared resource, finalizing it at zero."""
+        with self._lock:
+            entry = self._resources.get(key)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._resources[key]
+            # Under the lock, so a new acquire cannot load files mid-finalize
+            resource, _, finalize = entry
+            if finalize is not None:
+                finalize(resource)
+
+    def stats(self):
+        """Return the current reference counts, for diagnostics."""
+        with self._lock:
+            return {
+                "embedding_functions": {f"{backend}:{name}": entry[1]
+                                        for (backend, name), entry in self._functions.items()},
+                "clients": {path: entry[1] for path, entry in self._clients.items()},
+                "resources": {" ".join(map(str, key)): entry[1] for key, entry in self._resources.items()}
+            }
+
+    def shutdown(self):
+        """Release every shared resource regardless of reference counts.
+
+        Called once on application exit, after the components have shut
+        down, so nothing is left holding files or model memory.
+        """
+        with self._lock:
+            # Newest first, like MemoryManager.close releases its own
+            for key, (resource, _, finalize) in reversed(list(self._resources.items())):
+                if finalize is not None:
+                    try:
+                        finalize(resource)
+                    except Exception as e:
+                        print(f"Error releasing {key[0]}: {e}")
+            self._resources.clear()
+            for function, _ in self._functions.values():
+                function.unload()
+            self._functions.clear()
+            clients = [client for client, _ in self._clients.values()]
+            self._clients.clear()
+
+        for client in clients:
+            _close_client(client)
+        # Chroma also keeps a class-wide system cache; start clean if reopened
+        if clients and hasattr(clients[0], "clear_system_cache"):
+            try:
+                clients[0].clear_system_cache()
+            except Exception as e:
+                print(f"Error closing Chroma clients: {e}")
+
+
+# Shared registry for the whole process
+embedding_registry = EmbeddingRegistry()
@@ -2,6 +2,7 @@
 import os
 from _logging import Logger
 from config_manager import ConfigManager
+from embedding_registry import embedding_registry
 
 
 class EngineCore:
@@ -45,7 +46,17 @@ class EngineCore:
 
     def shutdown(self):
         """Shutdown all components"""
+        # Drain write-behind queues first, while every component is still up
+        for name, component in self.components.items():
+            if hasattr(component, 'flush'):
+                self.logger.info(f"Flushing component: {name}")
+                component.flush()
+
         for name, component in self.components.items():
             if hasattr(component, 'shutdown'):
                 self.logger.info(f"Shutting down component: {name}")
-                component.shutdown()
\ No newline at end of file
+                component.shutdown()
+
+        # Whatever the components left open (clients, stores, models)
+        self.logger.info("Shutting down embedding registry")
+        embedding_registry.shutdown()
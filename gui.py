@@ -1,5 +1,5 @@
 # gui.py - updated
-from PyQt6.QtCore import Qt, QThread
+from PyQt6.QtCore import Qt, QThread, QTimer
 from PyQt6.QtWidgets import (QMainWindow, QPlainTextEdit, QPushButton,
                              QVBoxLayout, QWidget, QHBoxLayout, QMenuBar, QMenu,
                              QFileDialog, QTextEdit, QMessageBox, QSplitter,
@@ -379,11 +379,14 @@ class SettingsTab(QWidget):
         config = self.engine.get_component("config")
         if config:
             config.set_section("model", model_settings)
-            config.set_section("memory", {
+            # Merge so memory keys edited by hand (batch sizes etc.) survive
+            memory_settings = dict(config.get_section("memory"))
+            memory_settings.update({
                 "auto_consolidation": self.memory_component.auto_consolidation,
                 "auto_pruning": self.memory_component.auto_pruning,
                 "consolidation_days": self.memory_component.consolidation_days
             })
+            config.set_section("memory", memory_settings)
 
         # Show confirmation
         QMessageBox.information(self, "Settings Saved", "Settings have been saved and applied.")
@@ -536,7 +539,25 @@ class ChatWindow(QMainWindow):
 
     def setup_status_bar(self):
         """Sets up the status bar."""
-        self.statusBar().showMessage("Ready")
+        if self.memory_component and not self.memory_component.is_ready():
+            # The memory model is still warming up in the background; poll
+            # rather than use a Future callback, which runs off the GUI thread
+            self.statusBar().showMessage("Loading memory model...")
+            self.warm_up_timer = QTimer(self)
+            self.warm_up_timer.timeout.connect(self.check_memory_ready)
+            self.warm_up_timer.start(250)
+        else:
+            self.statusBar().showMessage("Ready")
+
+    def check_memory_ready(self):
+        """Update the status bar once the memory model warm-up finishes."""
+        if not self.memory_component.is_ready():
+            return
+        self.warm_up_timer.stop()
+        if self.memory_component.ready.exception():
+            self.statusBar().showMessage("Memory model failed to preload; it will load on first use", 5000)
+        else:
+            self.statusBar().showMessage("Ready")
 
     def new_conversation(self):
         """Start a new conversation."""
@@ -0,0 +1,190 @@
+# lexical_index.py
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercase word tokens; numbers and short words are kept on purpose."""
+    return _TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+class BM25Index:
+    """Incrementally maintained BM25 index over one collection's documents.
+
+    Term frequencies per document are the source of truth and are saved as
+    JSON; postings and length statistics are rebuilt from them on load.
+    As with TopicIndex, the file is only written by save() (on flush and
+    close), and a `.dirty` marker flags changes that were never saved so
+    the index is rebuilt instead.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._doc_terms = {}  # memory id -> {term: tf}
+        self._doc_lengths = {}  # memory id -> token count
+        self._postings = {}  # term -> {memory id: tf}
+        self._total_length = 0
+        self._dirty = os.path.exists(self.dirty_path)
+        self._stale = self._dirty  # Unsaved changes from a previous run
+        self.load()
+
+    @property
+    def exists_on_disk(self):
+        """Whether a saved index file is present."""
+        return os.path.exists(self.path)
+
+    @property
+    def dirty_path(self):
+        """Marker present while the index holds changes not yet saved."""
+        return f"{self.path}.dirty"
+
+    @property
+    def is_stale(self):
+        """Whether the saved index missed changes, because the last run ended without saving."""
+        return self._stale
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def load(self):
+        """Load the index from disk, if it has been saved before."""
+        if not self.exists_on_disk:
+            return
+        try:
+            with open(self.path, "r") as f:
+                doc_terms = json.load(f).get("documents", {})
+        except Exception as e:
+            print(f"Error loading lexical index: {e}")
+            return
+
+        with self._lock:
+            self._clear()
+            for memory_id, terms in doc_terms.items():
+                self._insert(memory_id, terms)
+
+    def save(self):
+        """Write the index to disk atomically."""
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"documents": self._doc_terms}, f)
+            os.replace(tmp_path, self.path)
+            self._stale = False
+            if self._dirty:
+                try:
+                    os.remove(self.dirty_path)
+                except FileNotFoundError:
+                    pass  # Another process on this directory saved first
+                self._dirty = False
+
+    def add(self, memory_ids, texts):
+        """Index documents, replacing any previous version of the same ids."""
+        with self._lock:
+            for memory_id, text in zip(memory_ids, texts):
+                self._remove(memory_id)
+                self._insert(memory_id, Counter(tokenize(text)))
+            self._changed()
+
+    def remove(self, memory_ids):
+        """Drop documents from the index."""
+        with self._lock:
+            for memory_id in memory_ids:
+                self._remove(memory_id)
+            self._changed()
+
+    def clear(self):
+        """Empty the index."""
+        with self._lock:
+            self._clear()
+            self._changed()
+
+    def search(self, query, n_results=5):
+        """Return up to n_results (memory id, score) pairs, best first."""
+        terms = set(tokenize(query))
+        with self._lock:
+            doc_count = len(self._doc_terms)
+            if not terms or not doc_count:
+                return []
+
+            average_length = self._total_length / doc_count
+            k1, b = self.k1, self.b
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+                for memory_id, tf in postings.items():
+                    norm = k1 * (1 - b + b * self._doc_lengths[memory_id] / average_length)
+                    scores[memory_id] = scores.get(memory_id, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+    def _clear(self):
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._postings = {}
+        self._total_length = 0
+
+    def _insert(self, memory_id, terms):
+        terms = dict(terms)
+        length = sum(terms.values())
+        self._doc_terms[memory_id] = terms
+        self._doc_lengths[memory_id] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[memory_id] = tf
+
+    def _remove(self, memory_id):
+        terms = self._doc_terms.pop(memory_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(memory_id, 0)
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(memory_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def _changed(self):
+        if not self._dirty:
+            # Left behind by a crash, this tells the next load to rebuild
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            open(self.dirty_path, "w").close()
+            self._dirty = True
+
+
+def reciprocal_rank_fusion(result_lists, n_results=5, k=60):
+    """Fuse ranked memory lists with reciprocal rank fusion.
+
+    Each memory scores sum(1 / (k + rank)) over the lists it appears in; the
+    fused dicts carry that as "score" and keep a vector distance if any list
+    had one.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, memory in enumerate(results, 1):
+            entry = fused.get(memory["id"])
+            if entry is None:
+                entry = dict(memory)
+                entry["score"] = 0.0
+                fused[memory["id"]] = entry
+            elif entry.get("distance") is None and memory.get("distance") is not None:
+                entry["distance"] = memory["distance"]
+            entry["score"] += 1.0 / (k + rank)
+
+    return heapq.nlargest(n_results, fused.values(), key=lambda memory: memory["score"])
@@ -49,6 +49,7 @@ def main():
 
     # Create the application
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(engine.shutdown)
     engine.logger.info("QApplication created")
 
     # Create and show the UI
@@ -0,0 +1,78 @@
+# maintenance_journal.py
+import json
+import os
+import threading
+import uuid
+
+
+class MaintenanceJournal:
+    """Write-ahead journal for multi-step maintenance changes.
+
+    A change is recorded with begin() before any of its writes and closed
+    with commit() or abort(). Entries that were begun but never closed are
+    what a crash left half-done; pending() returns them so the owner can
+    roll them forward or back. Lines are flushed and fsynced, and the file
+    is truncated whenever nothing is pending.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = {}  # transaction id -> entry
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                lines = f.readlines()
+        except Exception as e:
+            print(f"Error loading maintenance journal: {e}")
+            return
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Torn final line: that step never completed
+            if record["state"] == "begin":
+                self._pending[record["tx"]] = record["entry"]
+            else:
+                self._pending.pop(record["tx"], None)
+
+    def _append(self, record):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def begin(self, entry):
+        """Record an intended change and return its transaction id."""
+        tx = str(uuid.uuid4())
+        with self._lock:
+            self._append({"tx": tx, "state": "begin", "entry": entry})
+            self._pending[tx] = entry
+        return tx
+
+    def commit(self, tx):
+        """Mark a change as fully applied."""
+        self._close(tx, "commit")
+
+    def abort(self, tx):
+        """Mark a change as rolled back."""
+        self._close(tx, "abort")
+
+    def _close(self, tx, state):
+        with self._lock:
+            self._pending.pop(tx, None)
+            if self._pending:
+                self._append({"tx": tx, "state": state})
+            elif os.path.exists(self.path):
+                # Nothing left to recover, so the history can go
+                os.remove(self.path)
+
+    def pending(self):
+        """Return (transaction id, entry) for every change left open."""
+        with self._lock:
+            return list(self._pending.items())
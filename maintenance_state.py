@@ -0,0 +1,70 @@
+# maintenance_state.py
+import json
+import os
+import threading
+import time
+
+
+class MaintenanceState:
+    """Persisted progress of the incremental maintenance jobs.
+
+    For each job and collection it keeps a watermark: the ts_epoch below
+    which every memory has already been visited. It also records when each
+    job last ran over everything. Saved as JSON, atomically, on every change.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._jobs = {}  # job -> {"watermarks": {collection: ts_epoch}, "last_full_run": epoch}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self._jobs = json.load(f).get("jobs", {})
+        except Exception as e:
+            print(f"Error loading maintenance state: {e}")
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"jobs": self._jobs}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def watermark(self, job, collection_name):
+        """Return the ts_epoch a job has processed a collection up to, or None."""
+        with self._lock:
+            return self._jobs.get(job, {}).get("watermarks", {}).get(collection_name)
+
+    def advance(self, job, collection_name, ts_epoch):
+        """Move a collection's watermark forward; it never moves back."""
+        with self._lock:
+            watermarks = self._jobs.setdefault(job, {}).setdefault("watermarks", {})
+            current = watermarks.get(collection_name)
+            if current is None or ts_epoch > current:
+                watermarks[collection_name] = ts_epoch
+                self._save()
+
+    def mark_full_run(self, job, when=None):
+        """Record that a job just visited every eligible memory."""
+        with self._lock:
+            self._jobs.setdefault(job, {})["last_full_run"] = when if when is not None else time.time()
+            self._save()
+
+    def full_run_due(self, job, max_age_days):
+        """Whether a job has never run in full or last did so max_age_days ago."""
+        with self._lock:
+            last_full_run = self._jobs.get(job, {}).get("last_full_run")
+        return last_full_run is None or time.time() - last_full_run >= max_age_days * 86400
+
+    def reset(self, job=None):
+        """Forget the progress of one job, or of all jobs."""
+        with self._lock:
+            if job is None:
+                self._jobs = {}
+            else:
+                self._jobs.pop(job, None)
+            self._save()
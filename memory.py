@@ -1,36 +1,69 @@
-import chromadb
-from chromadb.utils import embedding_functions
 import uuid
 from typing import List, Dict, Optional, Tuple
 import os
 import datetime
 import json
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
+import threading
+import heapq
+import itertools
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import re
 
+from embedding_registry import embedding_registry, DEFAULT_EMBEDDING_MODEL, WARM_UP_TEXTS
+from embedding_backends import DEFAULT_EMBEDDING_BACKEND, EMBEDDING_BACKENDS
+from embedding_pool import EmbeddingWorkerPool
+from topic_index import TopicIndex
+from recency_index import RecencyRing
+from maintenance_journal import MaintenanceJournal
+from maintenance_state import MaintenanceState
+from lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+from vector_store import ChromaVectorStore, FlatVectorStore
+
+# Backends a MemoryManager can store its collections in
+VECTOR_BACKENDS = ("chroma", "flat")
+
+# chromadb and nltk are imported only where they are first needed so that
+# importing this module stays cheap; see LazyMemoryManager below.
+
+
+# Used when the NLTK stopwords corpus is not installed. Words of three
+# letters or fewer are filtered by length anyway, so only longer ones matter.
+_FALLBACK_STOP_WORDS = {
+    'about', 'above', 'after', 'again', 'against', 'being', 'below', 'between',
+    'both', 'because', 'before', 'could', 'does', 'doing', 'down', 'during',
+    'each', 'from', 'further', 'have', 'having', 'here', 'hers', 'herself',
+    'himself', 'into', 'itself', 'just', 'more', 'most', 'myself', 'once',
+    'only', 'other', 'ours', 'ourselves', 'over', 'same', 'should', 'some',
+    'such', 'than', 'that', 'their', 'theirs', 'them', 'themselves', 'then',
+    'there', 'these', 'they', 'this', 'those', 'through', 'under', 'until',
+    'very', 'were', 'what', 'when', 'where', 'which', 'while', 'whom', 'will',
+    'with', 'would', 'your', 'yours', 'yourself', 'yourselves'
+}
+
 
 class TopicExtractor:
-    def __init__(self):
-        # Download required NLTK data (only needed once)
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
-        try:
-            nltk.data.find('corpora/stopwords')
-        except LookupError:
-            nltk.download('stopwords')
-        try:
-            nltk.data.find('corpora/wordnet')
-        except LookupError:
-            nltk.download('wordnet')
+    """Frequency-based topic extraction over lemmatized tokens.
 
-        self.stop_words = set(stopwords.words('english'))
-        self.lemmatizer = WordNetLemmatizer()
+    NLTK data is loaded on first use rather than at construction and is
+    never downloaded implicitly; missing corpora fall back to a built-in
+    stopword list and unlemmatized tokens. Call download_resources() once
+    during setup to fetch them.
+    """
+
+    NLTK_RESOURCES = {
+        'stopwords': 'corpora/stopwords',
+        'wordnet': 'corpora/wordnet'
+    }
+
+    def __init__(self, lemma_cache_size=50000):
+        self.lemma_cache_size = lemma_cache_size
+        self.stop_words = None
+        self.lemmatizer = None
+        self._lemmas = {}
+        self._resources_loaded = False
+        self._lock = threading.Lock()
+        self._punctuation = re.compile(r'[^\w\s]')
 
         # Add magical/esoteric terminology to our processing
         self.magical_terms = {
@@ -39,60 +72,158 @@ class TopicExtractor:
             'gnosis', 'servitor', 'egregore', 'thoughtform', 'divination'
         }
 
+    @classmethod
+    def download_resources(cls):
+        """Download the NLTK corpora used for stopwords and lemmatization."""
+        import nltk
+        for name in cls.NLTK_RESOURCES:
+            nltk.download(name, quiet=True)
+
+    def _load_resources(self):
+        """Load stopwords and the lemmatizer from local NLTK data, once."""
+        if self._resources_loaded:
+            return
+        with self._lock:
+            if self._resources_loaded:
+                return
+
+            stop_words = _FALLBACK_STOP_WORDS
+            lemmatizer = None
+            try:
+                import nltk
+                try:
+                    nltk.data.find(self.NLTK_RESOURCES['stopwords'])
+                    from nltk.corpus import stopwords
+                    stop_words = set(stopwords.words('english'))
+                except LookupError:
+                    pass
+                try:
+                    nltk.data.find(self.NLTK_RESOURCES['wordnet'])
+                    from nltk.stem import WordNetLemmatizer
+                    lemmatizer = WordNetLemmatizer()
+                except LookupError:
+                    pass
+            except ImportError:
+                pass
+
+            self.stop_words = stop_words
+            self.lemmatizer = lemmatizer
+            self._resources_loaded = True
+
+    def _lemmatize(self, word):
+        """Lemmatize a word, memoized in a bounded cache."""
+        lemma = self._lemmas.get(word)
+        if lemma is None:
+            lemma = self.lemmatizer.lemmatize(word) if self.lemmatizer else word
+            if len(self._lemmas) >= self.lemma_cache_size:
+                # Cheap bound: start over rather than track recency per word
+                self._lemmas.clear()
+            self._lemmas[word] = lemma
+        return lemma
+
+    def normalize_topic(self, topic):
+        """Lowercase and lemmatize a topic the same way extracted ones are."""
+        self._load_resources()
+        return self._lemmatize(topic.lower().strip())
+
     def extract_topics(self, text, top_n=5):
         """Extract the main topics from a text."""
         if not text:
             return []
 
-        # Preprocess the text
-        # Convert to lowercase and remove punctuation
-        text = re.sub(r'[^\w\s]', '', text.lower())
+        return self.extract_topics_batch([text], top_n)[0]
 
-        # Tokenize
-        tokens = word_tokenize(text)
+    def extract_topics_batch(self, texts, top_n=5):
+        """Extract the main topics from many texts, one list per text."""
+        self._load_resources()
 
-        # Remove stopwords and short words, but keep magical terms
-        filtered_tokens = [
-            self.lemmatizer.lemmatize(word) for word in tokens
-            if (word not in self.stop_words and len(word) > 3) or word in self.magical_terms
-        ]
+        stop_words = self.stop_words
+        magical_terms = self.magical_terms
+        punctuation = self._punctuation
+        lemmatize = self._lemmatize
 
-        # Count word frequency
-        word_freq = Counter(filtered_tokens)
+        results = []
+        for text in texts:
+            if not text:
+                results.append([])
+                continue
 
-        # Return top N topics
-        return word_freq.most_common(top_n)
+            # Convert to lowercase and remove punctuation; with punctuation
+            # gone, whitespace splitting matches the NLTK word tokenizer
+            tokens = punctuation.sub('', text.lower()).split()
+
+            # Remove stopwords and short words, but keep magical terms
+            word_freq = Counter(
+                lemmatize(word) for word in tokens
+                if (len(word) > 3 and word not in stop_words) or word in magical_terms
+            )
+
+            # Top N topics
+            results.append(word_freq.most_common(top_n))
+
+        return results
 
 
 class MemoryManager:
     def __init__(self,
                  persist_directory: str = "./chroma_db",
-                 collection_name: str = "memory_collection"):
-        """Initialize the memory system with ChromaDB."""
-        # Create directory if it doesn't exist
-        os.makedirs(persist_directory, exist_ok=True)
-
-        # Initialize the embedding function using SentenceTransformer
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
-        )
+                 collection_name: str = "memory_collection",
+                 embedding_model: str = DEFAULT_EMBEDDING_MODEL,
+                 embedding_backend: str = DEFAULT_EMBEDDING_BACKEND,
+                 embedding_batch_size: int = 64,
+                 embedding_cache_size: int = 10000,
+                 embedding_cache_dir: str = None,
+                 embedding_workers: int = 0,
+                 embedding_pool_threshold: int = 512,
+                 auto_topics: bool = True,
+                 history_size: int = 500,
+                 vector_backend: str = "chroma",
+                 vector_dtype: str = "float32",
+                 embedding_function=None):
+        """Initialize the memory system on ChromaDB or the flat memmap backend."""
+        if vector_backend not in VECTOR_BACKENDS:
+            raise ValueError(f"Unknown vector backend: {vector_backend}")
+        self.persist_directory = persist_directory
+        self.vector_backend = vector_backend
+        self.vector_dtype = vector_dtype  # Storage precision for the flat backend
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {embedding_backend}")
+        self.embedding_model = embedding_model
+        self.embedding_backend = embedding_backend  # Must stay fixed for a persist directory
+        self.embedding_batch_size = embedding_batch_size
+        self.auto_topics = auto_topics  # Tag new memories with extracted topic_N fields
+        self._closed = False
+        self._shared_keys = []  # Registry resources this manager holds a reference to
 
-        # Initialize ChromaDB client with persistence
-        self.client = chromadb.PersistentClient(path=persist_directory)
-
-        # Get or create collection
-        try:
-            self.collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
+        # The embedding model and Chroma client are shared process-wide, so
+        # several managers on the same directory only load them once. An
+        # injected embedding_function (benchmarks, tests) bypasses the registry.
+        self._shared_embedding = embedding_function is None
+        if self._shared_embedding:
+            embedding_function = embedding_registry.acquire_embedding_function(
+                embedding_model,
+                cache_size=embedding_cache_size,
+                cache_dir=embedding_cache_dir,
+                backend=embedding_backend
             )
-            print(f"Loaded existing collection: {collection_name}")
-        except:
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
+        self.embedding_function = embedding_function
+
+        # Optional process pool for big batches (bulk imports, re-embedding);
+        # workers rebuild the model themselves, so it needs a registry backend
+        self.embedding_pool = None
+        if embedding_workers and self._shared_embedding:
+            self.embedding_pool = EmbeddingWorkerPool(
+                embedding_backend,
+                embedding_model,
+                workers=embedding_workers,
+                min_batch=embedding_pool_threshold
             )
-            print(f"Created new collection: {collection_name}")
+        self.client = None
+        if vector_backend == "chroma":
+            self.client = embedding_registry.acquire_client(persist_directory)
+
+        # Get or create collection
+        self.collection = self._get_or_create_collection(collection_name)
 
         # Create topic extractor
         self.topic_extractor = TopicExtractor()
@@ -102,6 +233,102 @@ class MemoryManager:
         self.semantic_collection = self._get_or_create_collection("semantic_memory")
         self.procedural_collection = self._get_or_create_collection("procedural_memory")
 
+        # Write generation per collection, bumped on every add/update/delete so
+        # read caches can tell when their results went stale
+        self.generations = {name: 0 for name in self._collections_by_name()}
+        self._generation_lock = threading.Lock()
+
+        # Make sure older stores carry the numeric timestamp index
+        self.migrate_timestamp_index()
+
+        # Inverted topic -> memory index kept next to the Chroma data, one
+        # per directory; rebuilt when missing or left unsaved by a crash
+        topic_path = os.path.join(persist_directory, "topic_index.json")
+        self.topic_index, created = self._acquire_shared(
+            "topic_index", topic_path, lambda: TopicIndex(topic_path), finalize=lambda index: index.save()
+        )
+        if created and (not self.topic_index.exists_on_disk or self.topic_index.is_stale):
+            self.rebuild_topic_index()
+
+        # Local BM25 index per collection for exact-term lookups; it holds
+        # every document, so a count mismatch also means it fell behind
+        self.lexical_indexes = {}
+        for name, collection in self._collections_by_name().items():
+            path = os.path.join(persist_directory, "lexical_index", f"{name}.json")
+            index, created = self._acquire_shared(
+                "lexical_index", path, lambda path=path: BM25Index(path), finalize=lambda index: index.save()
+            )
+            if created and (not index.exists_on_disk or index.is_stale or len(index) != collection.count()):
+                self._build_lexical_index(collection, index)
+            self.lexical_indexes[name] = index
+
+        # Finish or undo maintenance changes a crash left half-applied. The
+        # lock keeps recovery away from a replacement still being written.
+        journal_path = os.path.join(persist_directory, "maintenance_journal.jsonl")
+        self.maintenance_journal = MaintenanceJournal(journal_path)
+        self._maintenance_lock, _ = self._acquire_shared("maintenance_lock", journal_path, threading.RLock)
+        self.recover_maintenance()
+
+        # Watermarks that let pruning and consolidation skip rows already visited
+        self.maintenance_state = MaintenanceState(os.path.join(persist_directory, "maintenance_state.json"))
+
+        # Newest-first ring of recent user/AI exchanges for history lookups
+        self.recent_exchanges = RecencyRing(
+            os.path.join(persist_directory, "recent_exchanges.jsonl"),
+            size=history_size
+        )
+
+        # Small pool used to query the typed collections concurrently
+        self._search_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="memory-search")
+
+    def close(self):
+        """Release this manager's references to the shared model, client and stores."""
+        if self._closed:
+            return
+        self._closed = True
+        self._search_executor.shutdown(wait=False)
+        if self.embedding_pool is not None:
+            self.embedding_pool.close()
+        # The last manager out saves the shared indexes and closes the stores
+        for key in reversed(self._shared_keys):
+            try:
+                embedding_registry.release_resource(key)
+            except Exception as e:
+                print(f"Error releasing {key[0]}: {e}")
+        self._shared_keys = []
+        if self._shared_embedding:
+            embedding_registry.release_embedding_function(self.embedding_model, self.embedding_backend)
+        if self.client is not None:
+            embedding_registry.release_client(self.persist_directory)
+
+    def save_indexes(self):
+        """Write the side indexes to disk.
+
+        They are otherwise only saved on close, so a long session can call
+        this to checkpoint them and skip the rebuild after a crash.
+        """
+        try:
+            self.topic_index.save()
+        except Exception as e:
+            print(f"Error saving topic index: {e}")
+        for name, index in self.lexical_indexes.items():
+            try:
+                index.save()
+            except Exception as e:
+                print(f"Error saving lexical index {name}: {e}")
+
+    def warm_up(self):
+        """Load the embedding model and run a dummy batch and query.
+
+        Pays model load, tokenizer set-up, the first forward pass and the
+        vector index's lazy load before the first real add or search.
+        """
+        warm = getattr(self.embedding_function, "warm_up", None)
+        vectors = warm() if warm else self.embedding_function(WARM_UP_TEXTS)
+        for collection in self._collections_by_name().values():
+            if collection.count():
+                self.query_by_embeddings(collection, vectors[:1], n_results=1)
+
     def add_memory(self,
                    text: str,
                    metadata: Dict = None,
@@ -110,16 +337,66 @@ class MemoryManager:
         if not text:
             return None
 
-        # Generate a unique ID if not provided
-        memory_id = id if id else str(uuid.uuid4())
+        return self.add_memories_bulk([text], [metadata], [id] if id else None)[0]
 
-        # Create default metadata if not provided
-        if metadata is None:
-            metadata = {}
+    def add_memories_bulk(self,
+                          texts: List[str],
+                          metadatas: List[Dict] = None,
+                          ids: List[str] = None,
+                          memory_type: str = None,
+                          upsert: bool = False) -> List[Optional[str]]:
+        """Add many memories at once with batched embedding and a single write.
+
+        memory_type selects the episodic/semantic/procedural collection; None
+        writes to the general collection like add_memory. With upsert=True
+        existing ids are overwritten instead of skipped. Returns the ids in
+        input order, with None for empty texts that were skipped.
+        """
+        collection = self._collection_for_type(memory_type)
+
+        if metadatas is None:
+            metadatas = [None] * len(texts)
+        if ids is None:
+            ids = [None] * len(texts)
+        if len(metadatas) != len(texts) or len(ids) != len(texts):
+            raise ValueError("texts, metadatas and ids must have the same length")
+
+        result_ids = []
+        batch_texts, batch_metadatas, batch_ids = [], [], []
+        for text, metadata, memory_id in zip(texts, metadatas, ids):
+            if not text:
+                result_ids.append(None)
+                continue
+
+            memory_id = memory_id if memory_id else str(uuid.uuid4())
+            metadata = self.sanitize_metadata(metadata)
+            if memory_type:
+                metadata["memory_type"] = memory_type
 
-        # Convert any non-primitive types to strings to satisfy ChromaDB requirements
+            batch_texts.append(text)
+            batch_metadatas.append(metadata)
+            batch_ids.append(memory_id)
+            result_ids.append(memory_id)
+
+        self._write_to_collection(collection, batch_texts, batch_metadatas, batch_ids, upsert)
+        return result_ids
+
+    def _collection_for_type(self, memory_type):
+        """Map a memory type name to its collection (None is the general one)."""
+        if memory_type is None:
+            return self.collection
+        if memory_type == "episodic":
+            return self.episodic_collection
+        if memory_type == "semantic":
+            return self.semantic_collection
+        if memory_type == "procedural":
+            return self.procedural_collection
+        raise ValueError(f"Unknown memory type: {memory_type}")
+
+    def sanitize_metadata(self, metadata):
+        """Copy metadata, converting non-primitive values for ChromaDB."""
         sanitized_metadata = {}
-        for key, value in metadata.items():
+        for key, value in (metadata or {}).items():
             if isinstance(value, (list, dict, tuple, set)):
                 sanitized_metadata[key] = str(value)
             else:
@@ -129,40 +406,151 @@ class MemoryManager:
         if "timestamp" not in sanitized_metadata:
             sanitized_metadata["timestamp"] = datetime.datetime.now().isoformat()
 
-        # Add memory to collection
-        self.collection.add(
-            documents=[text],
-            metadatas=[sanitized_metadata],
-            ids=[memory_id]
-        )
+        # Numeric copy of the timestamp; Chroma range operators only work on numbers
+        sanitized_metadata["ts_epoch"] = timestamp_to_epoch(sanitized_metadata["timestamp"])
+
+        return sanitized_metadata
+
+    def embed_texts(self, texts: List[str]) -> List:
+        """Embed texts in batches of embedding_batch_size.
+
+        Batches of at least embedding_pool_threshold texts are sharded across
+        the embedding worker pool instead, still going through the cache.
+        """
+        pool = self.embedding_pool
+        if pool is not None and len(texts) >= pool.min_batch:
+            cache = getattr(self.embedding_function, "cache", None)
+            if cache is not None:
+                return cache.embed(texts, pool.embed)
+            return pool.embed(texts)
+
+        embeddings = []
+        batch_size = max(1, self.embedding_batch_size)
+        for i in range(0, len(texts), batch_size):
+            embeddings.extend(self.embedding_function(texts[i:i + batch_size]))
+        return embeddings
+
+    def _max_write_batch(self):
+        """Largest number of records Chroma accepts in one write call."""
+        get_max = getattr(self.client, "get_max_batch_size", None)
+        if get_max:
+            return get_max()
+        return getattr(self.client, "max_batch_size", 5000)
+
+    def _write_to_collection(self, collection, texts, metadatas, ids, upsert=False):
+        """Embed and write records, one Chroma call per max-size chunk."""
+        if not texts:
+            return
+
+        topics_list = self._tag_topics(texts, metadatas)
+        embeddings = self.embed_texts(texts)
+        write = collection.upsert if upsert else collection.add
+        chunk = self._max_write_batch()
+        for i in range(0, len(texts), chunk):
+            write(
+                documents=texts[i:i + chunk],
+                metadatas=metadatas[i:i + chunk],
+                ids=ids[i:i + chunk],
+                embeddings=embeddings[i:i + chunk]
+            )
+
+        self.topic_index.add_many(collection.name, ids, topics_list)
+        self.lexical_indexes[collection.name].add(ids, texts)
+        self._bump_generation(collection)
+
+    def _tag_topics(self, texts, metadatas):
+        """Collect each memory's topics, extracting them when auto_topics is on.
+
+        Extracted topics are written into the metadata as topic_0..topic_N.
+        Returns one {topic: count} dict per memory for the topic index.
+        """
+        topics_list = [_topics_from_metadata(metadata) for metadata in metadatas]
+        if not self.auto_topics:
+            return topics_list
+
+        # Extract topics in one batch for every memory that has none yet
+        untagged = [i for i, topics in enumerate(topics_list) if not topics]
+        if not untagged:
+            return topics_list
+        try:
+            extracted_list = self.topic_extractor.extract_topics_batch([texts[i] for i in untagged])
+        except Exception as e:
+            print(f"Error extracting topics: {e}")
+            return topics_list
+
+        for i, extracted in zip(untagged, extracted_list):
+            for n, (topic, count) in enumerate(extracted):
+                metadatas[i][f"topic_{n}"] = topic
+                topics_list[i][topic] = count
+        return topics_list
 
-        return memory_id
     def search_by_topic(self, topic, n_results=5):
         """Search for memories containing a specific topic."""
-        # Build filters for each possible topic field
-        filters = []
-        for i in range(10):  # Assuming we store up to 10 topics
-            filter_key = f"topic_{i}"
-            filters.append({filter_key: topic})
+        if not topic:
+            return []
 
-        # Execute search with proper OR condition format
-        results = self.collection.query(
-            query_texts=["topic search"],  # Just a placeholder
-            n_results=n_results,
-            where={"$or": filters} if filters else None
-        )
+        # Look the topic up in the inverted index, strongest mentions first
+        hits = self.topic_index.lookup(topic) or self.topic_index.lookup(self.topic_extractor.normalize_topic(topic))
+        if not hits:
+            return []
 
-        # Format results
+        collections = self._collections_by_name()
         memories = []
-        if results["documents"] and len(results["documents"]) > 0:
-            for i, doc in enumerate(results["documents"][0]):
-                memories.append({
-                    "id": results["ids"][0][i],
-                    "text": doc,
-                    "metadata": results["metadatas"][0][i],
-                })
+        stale_ids = []
+        for start in range(0, len(hits), n_results):
+            wanted = hits[start:start + n_results]
 
-        return memories
+            # One get per collection that holds any of the wanted ids
+            found = {}
+            for collection_name in {name for _, name, _ in wanted}:
+                collection = collections.get(collection_name)
+                if collection is None:
+                    continue
+                ids = [memory_id for memory_id, name, _ in wanted if name == collection_name]
+                for memory in self._format_get_results(collection.get(ids=ids)):
+                    found[memory["id"]] = memory
+
+            for memory_id, _, _ in wanted:
+                if memory_id in found:
+                    memories.append(found[memory_id])
+                else:
+                    stale_ids.append(memory_id)
+
+            if len(memories) >= n_results:
+                break
+
+        # Memories deleted behind the index's back are dropped lazily
+        if stale_ids:
+            self.topic_index.remove(stale_ids)
+
+        return memories[:n_results]
+
+    def _collections_by_name(self):
+        """Map collection names to this manager's collections."""
+        collections = [self.collection, self.episodic_collection,
+                       self.semantic_collection, self.procedural_collection]
+        return {collection.name: collection for collection in collections}
+
+    def rebuild_topic_index(self, page_size: int = 500) -> int:
+        """Rebuild the topic index from the topic_N fields stored in Chroma.
+
+        Returns the number of memories indexed.
+        """
+        self.topic_index.clear()
+        indexed = 0
+        for name, collection in self._collections_by_name().items():
+            offset = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+                topics_list = [_topics_from_metadata(metadata or {}) for metadata in page["metadatas"]]
+                self.topic_index.add_many(name, page["ids"], topics_list)
+                indexed += sum(1 for topics in topics_list if topics)
+
+        self.topic_index.save()
+        return indexed
 
     def search_memory(self, query: str, n_results: int = 5, metadata_filter: Dict = None) -> List[Dict]:
         """Search for memories similar to the query."""
@@ -171,23 +559,13 @@ class MemoryManager:
 
         # Execute search
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=self.embed_texts([query]),
             n_results=n_results,
             where=metadata_filter
         )
 
         # Format results for ease of use
-        memories = []
-        if results["documents"] and len(results["documents"]) > 0:
-            for i, doc in enumerate(results["documents"][0]):
-                memories.append({
-                    "id": results["ids"][0][i],
-                    "text": doc,
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if "distances" in results else None
-                })
-
-        return memories
+        return self._format_query_results(results)
 
     def get_memory_by_id(self, memory_id: str) -> Optional[Dict]:
         """Retrieve a specific memory by its ID."""
@@ -212,12 +590,32 @@ class MemoryManager:
                 else:
                     metadata = {}
 
+            metadata = dict(metadata)
+            if "timestamp" in metadata:
+                metadata["ts_epoch"] = timestamp_to_epoch(metadata["timestamp"])
+
+            # Re-extract topics for the new text
+            stale_topic_keys = []
+            if self.auto_topics:
+                stale_topic_keys = [key for key in metadata if key.startswith("topic_")]
+                for key in stale_topic_keys:
+                    del metadata[key]
+            topics = self._tag_topics([text], [metadata])[0]
+
+            # Updates merge metadata, so old topic_N fields the new text no
+            # longer fills must be removed explicitly; None deletes a key
+            for key in stale_topic_keys:
+                metadata.setdefault(key, None)
+
             # Update memory
             self.collection.update(
                 ids=[memory_id],
                 documents=[text],
                 metadatas=[metadata]
             )
+            self.topic_index.add(memory_id, self.collection.name, topics)
+            self.lexical_indexes[self.collection.name].add([memory_id], [text])
+            self._bump_generation(self.collection)
             return True
         except Exception as e:
             print(f"Error updating memory: {e}")
@@ -226,48 +624,384 @@ class MemoryManager:
     def delete_memory(self, memory_id: str) -> bool:
         """Delete a memory by its ID."""
         try:
-            self.collection.delete(ids=[memory_id])
+            self.delete_memories([memory_id])
             return True
         except Exception as e:
             print(f"Error deleting memory: {e}")
             return False
 
+    def delete_memories(self, ids: List[str], memory_type: str = None, collection=None):
+        """Delete memories by id and drop them from the side indexes.
+
+        collection, when given, takes precedence over memory_type. Errors
+        from Chroma propagate so maintenance jobs can react to them.
+        """
+        if not ids:
+            return
+        if collection is None:
+            collection = self._collection_for_type(memory_type)
+
+        ids = list(ids)
+        chunk = self._max_write_batch()
+        for i in range(0, len(ids), chunk):
+            collection.delete(ids=ids[i:i + chunk])
+        self.topic_index.remove(ids)
+        self.lexical_indexes[collection.name].remove(ids)
+        self._bump_generation(collection)
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict], memory_type: str = None, collection=None):
+        """Merge metadata fields into existing memories without re-embedding them.
+
+        Only the given keys change; values must already be primitive. Text
+        and embeddings are untouched, so rows keep their place and offset
+        paging in progress is not disturbed.
+        """
+        if not ids:
+            return
+        if collection is None:
+            collection = self._collection_for_type(memory_type)
+
+        ids, metadatas = list(ids), list(metadatas)
+        chunk = self._max_write_batch()
+        for i in range(0, len(ids), chunk):
+            collection.update(ids=ids[i:i + chunk], metadatas=metadatas[i:i + chunk])
+        self._bump_generation(collection)
+
+    def replace_memories(self, texts: List[str], metadatas: List[Dict], source_ids: List[str],
+                         memory_type: str = "semantic", source_type: str = "episodic") -> List[str]:
+        """Write new memories and delete the ones they replace as one unit.
+
+        Used by consolidation: the summaries are written first and the
+        sources deleted only after that succeeded, with both steps journaled.
+        A failed summary write is rolled back; a failure or crash after it is
+        rolled forward by recover_maintenance(). Sources are therefore never
+        gone without their summaries. Returns the new ids.
+        """
+        ids = [str(uuid.uuid4()) for _ in texts]
+        with self._maintenance_lock:
+            tx = self.maintenance_journal.begin({
+                "op": "replace",
+                "ids": ids,
+                "memory_type": memory_type,
+                "source_ids": list(source_ids),
+                "source_type": source_type
+            })
+
+            try:
+                self.add_memories_bulk(texts, metadatas, ids=ids, memory_type=memory_type, upsert=True)
+            except Exception:
+                self.delete_memories(ids, memory_type=memory_type)
+                self.maintenance_journal.abort(tx)
+                raise
+
+            # Left pending on failure so recovery can finish the deletes
+            self.delete_memories(source_ids, memory_type=source_type)
+            self.maintenance_journal.commit(tx)
+        return ids
+
+    def recover_maintenance(self) -> int:
+        """Resolve journaled maintenance changes left open by a crash or failure.
+
+        A replacement whose new memories were all written is rolled forward
+        by deleting its sources (deletes are idempotent); otherwise the
+        partial write is rolled back. Runs at startup and before every
+        consolidation and pruning run. Returns the number of changes resolved.
+        """
+        resolved = 0
+        with self._maintenance_lock:
+            for tx, entry in self.maintenance_journal.pending():
+                try:
+                    if entry["op"] != "replace":
+                        self.maintenance_journal.abort(tx)
+                        continue
+                    collection = self._collection_for_type(entry["memory_type"])
+                    written = collection.get(ids=entry["ids"], include=[])["ids"]
+                    if len(written) == len(entry["ids"]):
+                        self.delete_memories(entry["source_ids"], memory_type=entry["source_type"])
+                        self.maintenance_journal.commit(tx)
+                    else:
+                        self.delete_memories(written, collection=collection)
+                        self.maintenance_journal.abort(tx)
+                    resolved += 1
+                except Exception as e:
+                    print(f"Error recovering maintenance change {tx}: {e}")
+        if resolved:
+            print(f"Recovered {resolved} interrupted maintenance changes")
+        return resolved
+
+    def _bump_generation(self, collection):
+        """Record that a collection's contents changed."""
+        with self._generation_lock:
+            self.generations[collection.name] = self.generations.get(collection.name, 0) + 1
+
+    def get_generations(self, memory_type: str = None, typed: bool = True) -> Tuple[int, ...]:
+        """Current write generations of the collections a search would touch.
+
+        With typed=True a None memory_type means the three typed collections
+        (as in search_many); otherwise it means the general collection.
+        """
+        if typed:
+            collections = self._search_collections(memory_type)
+        else:
+            collections = [self._collection_for_type(memory_type)]
+        with self._generation_lock:
+            return tuple(self.generations.get(collection.name, 0) for collection in collections)
+
     def add_conversation(self, user_message: str, ai_response: str) -> Tuple[str, str]:
         """Store a conversation exchange between user and AI."""
         # Generate a conversation ID to link messages
         conversation_id = str(uuid.uuid4())
         timestamp = datetime.datetime.now().isoformat()
+        user_id = str(uuid.uuid4())
+        ai_id = str(uuid.uuid4())
 
-        # Store user message
         user_metadata = {
             "type": "user_message",
             "timestamp": timestamp,
             "conversation_id": conversation_id
         }
-        user_id = self.add_memory(user_message, user_metadata)
-
-        # Store AI response
         ai_metadata = {
             "type": "ai_response",
             "timestamp": timestamp,
             "conversation_id": conversation_id,
             "in_response_to": user_id
         }
-        ai_id = self.add_memory(ai_response, ai_metadata)
+
+        # Tag topics up front so the history entry can carry them too
+        self._tag_topics([user_message, ai_response], [user_metadata, ai_metadata])
+
+        # Store both messages with one embedding pass and one write
+        user_id, ai_id = self.add_memories_bulk(
+            [user_message, ai_response],
+            [user_metadata, ai_metadata],
+            [user_id, ai_id]
+        )
+
+        self.record_exchange(user_message, ai_response, user_id, ai_id,
+                             conversation_id, timestamp, user_metadata)
 
         return (user_id, ai_id)
 
+    def record_exchange(self, user_message: str, ai_response: str,
+                        user_id: str = None, ai_id: str = None,
+                        conversation_id: str = None, timestamp: str = None,
+                        metadata: Dict = None):
+        """Append a user/AI exchange to the recent history ring."""
+        self.recent_exchanges.append({
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "ai_id": ai_id,
+            "user_message": user_message,
+            "ai_response": ai_response,
+            "timestamp": timestamp or datetime.datetime.now().isoformat(),
+            "metadata": self.sanitize_metadata(metadata)
+        })
+
     def get_conversation_history(self, limit: int = 10) -> List[Dict]:
-        """Get recent conversation history."""
-        # Query for recent AI responses (which link to user messages)
-        results = self.collection.query(
-            query_texts=["conversation"],  # Generic query to get conversations
-            n_results=limit,
-            where={"type": {"$eq": "ai_response"}}  # Use proper operator format
+        """Get the last `limit` user/AI exchanges, oldest first.
+
+        Served from the recent history ring, so it costs the same however
+        large the store is and never needs an embedding.
+        """
+        return list(reversed(self.recent_exchanges.latest(limit)))
+
+    def time_range_filter(self, start=None, end=None, where: Dict = None) -> Optional[Dict]:
+        """Build a where clause selecting memories with start <= time < end.
+
+        start and end may be datetimes or epoch seconds; either may be None.
+        The clause is ANDed with any extra where filter.
+        """
+        clauses = []
+        if start is not None:
+            clauses.append({"ts_epoch": {"$gte": _to_epoch(start)}})
+        if end is not None:
+            clauses.append({"ts_epoch": {"$lt": _to_epoch(end)}})
+        if where:
+            clauses.append(where)
+        return combine_where(*clauses)
+
+    def get_memories_in_range(self, start=None, end=None, memory_type: str = None,
+                              where: Dict = None, limit: int = None) -> List[Dict]:
+        """Get memories whose timestamp falls in [start, end), oldest first."""
+        collection = self._collection_for_type(memory_type)
+        results = collection.get(
+            where=self.time_range_filter(start, end, where),
+            limit=limit,
+            include=["documents", "metadatas"]
         )
+        memories = self._format_get_results(results)
+        memories.sort(key=lambda m: m["metadata"].get("ts_epoch", 0))
+        return memories
+
+    def get_recent_memories(self, limit: int = 10, memory_type: str = None,
+                            where: Dict = None) -> List[Dict]:
+        """Get the most recent memories, newest first.
+
+        Looks back over a window that doubles from one hour until enough
+        memories are found, so recent items never require a full scan.
+        """
+        collection = self._collection_for_type(memory_type)
+        now = datetime.datetime.now().timestamp()
+        window = 3600.0
+        oldest_allowed = now - 10 * 365 * 24 * 3600
+
+        while True:
+            start = now - window
+            if start <= oldest_allowed:
+                # Give up narrowing and take everything that matches
+                start = None
+            results = collection.get(
+                where=self.time_range_filter(start=start, where=where),
+                include=["documents", "metadatas"]
+            )
+            if len(results["ids"]) >= limit or start is None:
+                break
+            window *= 2
+
+        memories = self._format_get_results(results)
+        memories.sort(key=lambda m: m["metadata"].get("ts_epoch", 0), reverse=True)
+        return memories[:limit]
+
+    def _format_get_results(self, results):
+        """Turn a Chroma get result into memory dicts"""
+        metadatas = results.get("metadatas") or [{}] * len(results["ids"])
+        documents = results.get("documents") or [None] * len(results["ids"])
+        return [
+            {"id": memory_id, "text": documents[i], "metadata": metadatas[i] or {}}
+            for i, memory_id in enumerate(results["ids"])
+        ]
+
+    def iter_pages(self, collection, where: Dict = None, page_size: int = 500,
+                   include: List[str] = None, deleted: set = None):
+        """Yield a collection's memories as lists of memory dicts, page by page.
+
+        Pages are fetched with limit/offset, so only page_size rows are held
+        at once. include takes Chroma's include names; "embeddings" adds an
+        "embedding" key. To delete memories of a page before the next one is
+        read, pass a set as `deleted` and add the deleted ids to it; the next
+        offset then accounts for them and no rows are skipped.
+        """
+        include = ["documents", "metadatas"] if include is None else list(include)
+        offset = 0
+        while True:
+            page = collection.get(where=where, include=include, limit=page_size, offset=offset)
+            if not page["ids"]:
+                return
+
+            memories = self._format_get_results(page)
+            embeddings = page.get("embeddings") if "embeddings" in include else None
+            if embeddings is not None:
+                for memory, embedding in zip(memories, embeddings):
+                    memory["embedding"] = embedding
+            yield memories
+
+            removed = sum(1 for memory in memories if memory["id"] in deleted) if deleted else 0
+            offset += len(memories) - removed
+            if len(page["ids"]) < page_size:
+                return
+
+    def iter_memories(self, collection, where: Dict = None, page_size: int = 500,
+                      include: List[str] = None):
+        """Yield every memory in a collection as a dict, one page at a time.
+
+        See iter_pages. Deleting yielded memories mid-iteration shifts the
+        offsets and skips rows, so callers collect ids and delete afterwards,
+        or use iter_pages with `deleted`.
+        """
+        for memories in self.iter_pages(collection, where, page_size, include):
+            yield from memories
+
+    def reembed_all(self, batch_size: int = 2048) -> int:
+        """Recompute every stored embedding with the current embedding function.
+
+        For use after switching to a model or backend of the same dimension.
+        Ids are listed first and rows re-embedded by id, because updating an
+        embedding can move a row and upset offset paging. Batches go through
+        the embedding worker pool when one is enabled. Returns the number of
+        memories re-embedded.
+        """
+        total = 0
+        for collection in self._collections_by_name().values():
+            ids = [memory["id"] for memory in self.iter_memories(collection, page_size=batch_size, include=[])]
+            for start in range(0, len(ids), batch_size):
+                page = collection.get(ids=ids[start:start + batch_size], include=["documents"])
+                pairs = [(memory_id, text) for memory_id, text in zip(page["ids"], page["documents"]) if text]
+                if not pairs:
+                    continue
+                batch_ids, texts = zip(*pairs)
+                collection.update(ids=list(batch_ids), embeddings=self.embed_texts(list(texts)))
+                total += len(pairs)
+            self._bump_generation(collection)
+        return total
+
+    def migrate_timestamp_index(self, page_size: int = 500) -> int:
+        """Backfill ts_epoch on memories stored before it existed.
+
+        Runs once per persist directory; a marker file records completion.
+        Returns the number of memories updated.
+        """
+        marker = os.path.join(self.persist_directory, "ts_epoch_migrated")
+        if os.path.exists(marker):
+            return 0
+
+        updated = 0
+        collections = [self.collection, self.episodic_collection,
+                       self.semantic_collection, self.procedural_collection]
+        for collection in collections:
+            offset = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+                if not page["ids"]:
+                    break
+                offset += len(page["ids"])
+
+                ids, metadatas = [], []
+                for memory_id, metadata in zip(page["ids"], page["metadatas"]):
+                    metadata = dict(metadata or {})
+                    if "ts_epoch" in metadata:
+                        continue
+                    if "timestamp" not in metadata:
+                        metadata["timestamp"] = datetime.datetime.now().isoformat()
+                    metadata["ts_epoch"] = timestamp_to_epoch(metadata["timestamp"])
+                    ids.append(memory_id)
+                    metadatas.append(metadata)
+
+                if ids:
+                    collection.update(ids=ids, metadatas=metadatas)
+                    updated += len(ids)
+
+        with open(marker, "w") as f:
+            f.write(datetime.datetime.now().isoformat())
+        if updated:
+            print(f"Backfilled ts_epoch on {updated} memories")
+        return updated
+
+    def _acquire_shared(self, kind, path, factory, finalize=None):
+        """Get the process-wide instance of some per-directory state.
+
+        Every manager on a directory must use the same object: separate
+        copies would hand out the same row numbers or overwrite each
+        other's files. Returns (resource, created).
+        """
+        key = (kind, os.path.abspath(path))
+        resource = embedding_registry.acquire_resource(key, factory, finalize)
+        self._shared_keys.append(key)
+        return resource
 
     def _get_or_create_collection(self, collection_name):
-        """Get or create a ChromaDB collection"""
+        """Get or create a collection on the configured vector backend"""
+        if self.vector_backend == "flat":
+            directory = os.path.join(self.persist_directory, "flat_index")
+            store, _ = self._acquire_shared(
+                "flat_store",
+                os.path.join(directory, collection_name),
+                lambda: FlatVectorStore(directory, collection_name,
+                                        embedding_function=self.embedding_function,
+                                        dtype=self.vector_dtype),
+                finalize=lambda store: store.close()
+            )
+            return store
+
         try:
             collection = self.client.get_collection(
                 name=collection_name,
@@ -278,7 +1012,7 @@ class MemoryManager:
                 name=collection_name,
                 embedding_function=self.embedding_function
             )
-        return collection
+        return ChromaVectorStore(collection)
 
     def add_episodic_memory(self, text, metadata=None):
         """Add a memory of a specific event or conversation"""
@@ -304,37 +1038,130 @@ class MemoryManager:
     def _add_to_collection(self, collection, text, metadata=None):
         """Internal method to add to a specific collection"""
         memory_id = str(uuid.uuid4())
+        self._write_to_collection(collection, [text], [self.sanitize_metadata(metadata)], [memory_id])
+        return memory_id
 
-        if metadata is None:
-            metadata = {}
+    def search_all_memories(self, query, n_results=5):
+        """Search across all memory types"""
+        if not query:
+            return []
 
-        # Ensure all metadata values are primitive types
-        for key, value in list(metadata.items()):  # Use list() to avoid modifying during iteration
-            if isinstance(value, (list, dict, tuple)):
-                metadata[key] = str(value)
+        return self.search_many([query], n_results)[0]
 
-        if "timestamp" not in metadata:
-            metadata["timestamp"] = datetime.datetime.now().isoformat()
+    def search_many(self, queries: List[str], n_results: int = 5,
+                    memory_type: str = None, where: Dict = None) -> List[List[Dict]]:
+        """Search several queries at once, returning one result list per query.
 
-        collection.add(
-            documents=[text],
-            metadatas=[metadata],
-            ids=[memory_id]
-        )
+        All queries are embedded in one batch and each collection gets a
+        single multi-query lookup. memory_type limits the search to one typed
+        collection; None searches episodic, semantic and procedural memories
+        and merges them per query by distance.
+        """
+        if not queries:
+            return []
 
-        return memory_id
+        query_embeddings = self.embed_texts(list(queries))
+        collections = self._search_collections(memory_type)
 
-    def search_all_memories(self, query, n_results=5):
-        """Search across all memory types"""
-        episodic = self.search_episodic_memory(query, n_results)
-        semantic = self.search_semantic_memory(query, n_results)
-        procedural = self.search_procedural_memory(query, n_results)
+        # Look the batch up in every collection concurrently
+        futures = [
+            self._search_executor.submit(self.query_by_embeddings, collection, query_embeddings, n_results, where)
+            for collection in collections
+        ]
+        per_collection = [future.result() for future in futures]
+
+        # Combine and keep the closest matches (distance) for each query
+        return [
+            heapq.nsmallest(n_results, itertools.chain.from_iterable(r[i] for r in per_collection), key=_distance_key)
+            for i in range(len(queries))
+        ]
+
+    def lexical_search(self, query: str, n_results: int = 5,
+                       memory_type: str = None, where: Dict = None) -> List[Dict]:
+        """Keyword search over the local BM25 indexes, best match first.
+
+        No embedding is computed. memory_type and where behave as in
+        search_many; each result carries its BM25 "score".
+        """
+        if not query:
+            return []
+
+        # Over-fetch when filtering, since some hits may not match the filter
+        pool = n_results * 4 if where else n_results
+        hits = []
+        for collection in self._search_collections(memory_type):
+            for memory_id, score in self.lexical_indexes[collection.name].search(query, pool):
+                hits.append((score, memory_id, collection))
+        hits = heapq.nlargest(pool, hits, key=lambda hit: hit[0])
 
-        # Combine and sort by relevance (distance)
-        all_memories = episodic + semantic + procedural
-        all_memories.sort(key=lambda x: x.get("distance", float("inf")))
+        found = {}
+        for collection in {hit[2] for hit in hits}:
+            ids = [memory_id for _, memory_id, owner in hits if owner is collection]
+            for memory in self._format_get_results(collection.get(ids=ids, where=where)):
+                found[memory["id"]] = memory
+
+        memories = []
+        for score, memory_id, collection in hits:
+            memory = found.get(memory_id)
+            if memory is None:
+                if not where:
+                    # Deleted behind the index's back; drop it lazily
+                    self.lexical_indexes[collection.name].remove([memory_id])
+                continue
+            memory["distance"] = None
+            memory["score"] = score
+            memories.append(memory)
+
+        return memories[:n_results]
+
+    def hybrid_search(self, query: str, n_results: int = 5, memory_type: str = None,
+                      where: Dict = None, mode: str = "hybrid") -> List[Dict]:
+        """Search with a selectable retrieval mode.
+
+        "vector" is the embedding search, "lexical" the BM25 search, and
+        "hybrid" fuses both with reciprocal rank fusion. "auto" answers
+        short keyword queries from the lexical index alone when it has
+        enough hits and otherwise falls back to hybrid.
+        """
+        if not query:
+            return []
 
-        return all_memories[:n_results]
+        if mode == "vector":
+            return self.search_many([query], n_results, memory_type, where)[0]
+        if mode == "lexical":
+            return self.lexical_search(query, n_results, memory_type, where)
+
+        if mode == "auto" and len(tokenize(query)) <= 3:
+            lexical = self.lexical_search(query, n_results, memory_type, where)
+            if len(lexical) >= n_results:
+                return lexical
+        elif mode not in ("hybrid", "auto"):
+            raise ValueError(f"Unknown search mode: {mode}")
+
+        # The lexical side runs on the pool while the vector search (which
+        # fans out on the pool itself) runs here, so the pool never waits on itself
+        candidates = n_results * 2
+        lexical = self._search_executor.submit(self.lexical_search, query, candidates, memory_type, where)
+        vector = self.search_many([query], candidates, memory_type, where)[0]
+        return reciprocal_rank_fusion([vector, lexical.result()], n_results)
+
+    def _search_collections(self, memory_type):
+        """Collections searched for a memory type; None means all three typed ones."""
+        if memory_type:
+            return [self._collection_for_type(memory_type)]
+        return [self.episodic_collection, self.semantic_collection, self.procedural_collection]
+
+    def _build_lexical_index(self, collection, index, page_size=500):
+        """Fill a lexical index from the documents stored in a collection."""
+        index.clear()
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            index.add(page["ids"], page["documents"])
+        index.save()
 
     def search_episodic_memory(self, query, n_results=5):
         """Search only episodic memories"""
@@ -353,23 +1180,165 @@ class MemoryManager:
         if not query:
             return []
 
+        return self.query_by_embeddings(collection, self.embed_texts([query]), n_results)[0]
+
+    def query_by_embeddings(self, collection, query_embeddings, n_results=5, where=None):
+        """Query a collection with precomputed embeddings in a single call.
+
+        Returns one list of memory dicts per query embedding.
+        """
+        if not len(query_embeddings):
+            return []
+
         results = collection.query(
-            query_texts=[query],
-            n_results=n_results
+            # Older Chroma versions only accept plain lists of floats
+            query_embeddings=[e.tolist() if hasattr(e, "tolist") else e for e in query_embeddings],
+            n_results=n_results,
+            where=where
         )
+        return [self._format_query_results(results, i) for i in range(len(query_embeddings))]
 
+    def _format_query_results(self, results, query_index=0):
+        """Turn one query's slice of a Chroma query result into memory dicts"""
         memories = []
-        if results["documents"] and len(results["documents"]) > 0:
-            for i, doc in enumerate(results["documents"][0]):
+        if results["documents"] and len(results["documents"]) > query_index:
+            distances = results.get("distances")
+            for i, doc in enumerate(results["documents"][query_index]):
                 memories.append({
-                    "id": results["ids"][0][i],
+                    "id": results["ids"][query_index][i],
                     "text": doc,
-                    "metadata": results["metadatas"][0][i],
-                    "distance": results["distances"][0][i] if "distances" in results else None
+                    "metadata": results["metadatas"][query_index][i],
+                    "distance": distances[query_index][i] if distances else None
                 })
 
         return memories
 
 
-# Create a singleton instance of the memory manager
-memory_manager = MemoryManager()
\ No newline at end of file
+def timestamp_to_epoch(timestamp) -> float:
+    """Convert an ISO timestamp string to epoch seconds (now if unparseable)."""
+    try:
+        return datetime.datetime.fromisoformat(str(timestamp)).timestamp()
+    except ValueError:
+        return datetime.datetime.now().timestamp()
+
+
+def _to_epoch(value) -> float:
+    """Accept a datetime, ISO string or epoch seconds and return epoch seconds."""
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return timestamp_to_epoch(value)
+    return float(value)
+
+
+def _topics_from_metadata(metadata) -> Dict[str, int]:
+    """Read topic_N metadata fields into a {topic: count} dict."""
+    return {str(value): 1 for key, value in metadata.items() if key.startswith("topic_") and value}
+
+
+def combine_where(*clauses) -> Optional[Dict]:
+    """AND together Chroma where clauses, dropping empty ones."""
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": list(clauses)}
+
+
+def _distance_key(memory):
+    """Sort key putting memories without a distance last."""
+    distance = memory.get("distance")
+    return float("inf") if distance is None else distance
+
+
+class LazyMemoryManager:
+    """Proxy that builds the real MemoryManager on first attribute access.
+
+    Constructing a MemoryManager loads the embedding model, opens the Chroma
+    client and checks NLTK data, so doing it at import time made every module
+    that imports `memory` pay that cost up front.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self._instance = None
+        self._lock = threading.Lock()
+        self._warm_up_thread = None
+
+    def configure(self, *args, **kwargs) -> bool:
+        """Set the arguments the shared MemoryManager will be built with.
+
+        Returns False if it has already been created; it then keeps the
+        settings it was built with.
+        """
+        with self._lock:
+            if self._instance is not None:
+                return False
+            self._args = args
+            self._kwargs = kwargs
+            return True
+
+    def get_instance(self) -> MemoryManager:
+        """Return the underlying MemoryManager, creating it if needed."""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = MemoryManager(*self._args, **self._kwargs)
+        return self._instance
+
+    @property
+    def is_loaded(self) -> bool:
+        """Whether the underlying MemoryManager has been created yet."""
+        return self._instance is not None
+
+    def warm_up(self, background: bool = True) -> Optional[threading.Thread]:
+        """Create the MemoryManager ahead of first use.
+
+        With background=True the work runs on a daemon thread and the thread
+        is returned; callers that touch the proxy meanwhile simply block on
+        the construction lock until it finishes.
+        """
+        if self._instance is not None:
+            return None
+        if not background:
+            self.get_instance()
+            return None
+
+        with self._lock:
+            if self._warm_up_thread is None:
+                self._warm_up_thread = threading.Thread(
+                    target=self._warm_up_worker,
+                    name="memory-warm-up",
+                    daemon=True
+                )
+                self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def close(self):
+        """Close the underlying manager if it was ever created."""
+        if self._instance is not None:
+            self._instance.close()
+
+    def _warm_up_worker(self):
+        try:
+            self.get_instance()
+        except Exception as e:
+            print(f"Error warming up memory manager: {e}")
+
+    def __getattr__(self, name):
+        # Only reached for attributes not set in __init__; never proxy dunders
+        # so copy/pickle probing does not trigger a model load.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get_instance(), name)
+
+
+# Shared memory manager; the real instance is only created on first use
+memory_manager = LazyMemoryManager()
+
+
+def get_memory_manager() -> MemoryManager:
+    """Return the shared MemoryManager, creating it on first call."""
+    return memory_manager.get_instance()
\ No newline at end of file
@@ -1,14 +1,32 @@
 # memory_component.py
+import copy
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, wait
+
 from component import Component
-from memory import MemoryManager
+from memory import get_memory_manager, memory_manager as shared_memory_manager
 from memory_consolidation import MemoryConsolidator
 from memory_importance import MemoryImportanceScorer
 from memory_visualizations import MemoryVisualizer
 from memory_pruning import MemoryPruner
 from conversation_threading import ThreadManager
+from memory_writer import MemoryWriteQueue
 
 
 class MemoryComponent(Component):
+    # Keys of the "memory" config section that initialize() applies
+    SETTINGS = (
+        "persist_directory", "auto_consolidation", "auto_pruning", "consolidation_days", "pruning_days",
+        "importance_threshold", "importance_batch_size", "importance_batch_tokens", "full_maintenance_days",
+        "embedding_backend", "embedding_batch_size", "embedding_workers", "embedding_pool_threshold",
+        "embedding_cache_size", "embedding_cache_on_disk", "search_mode", "search_cache_size",
+        "write_behind", "write_queue_size", "warm_up_on_start", "vector_backend", "vector_dtype",
+    )
+
     def __init__(self, persist_directory="./chroma_db"):
         super().__init__("memory")
         self.persist_directory = persist_directory
@@ -20,6 +38,16 @@ class MemoryComponent(Component):
         self.visualizer = None
         self.pruner = None
         self.thread_manager = None
+        self.writer = None
+
+        # Resolved once the embedding model is loaded and warm
+        self.ready = None
+
+        # LRU of search results, validated against collection write generations
+        self._search_cache = OrderedDict()
+        self._search_cache_lock = threading.Lock()
+        self.search_cache_hits = 0
+        self.search_cache_misses = 0
 
         # Settings
         self.auto_consolidation = True
@@ -27,6 +55,22 @@ class MemoryComponent(Component):
         self.consolidation_days = 30
         self.pruning_days = 90
         self.importance_threshold = 30
+        self.importance_batch_size = 20  # Memories judged per model call when scoring in bulk
+        self.importance_batch_tokens = 3000  # Rough token budget for the memories of one scoring prompt
+        self.full_maintenance_days = 30  # Rescan everything this often; runs in between are incremental
+        self.embedding_backend = "sentence-transformers"  # "onnx-int8" for quantized CPU inference, "hashing" offline
+        self.embedding_batch_size = 64
+        self.embedding_workers = 0  # Worker processes for large embedding batches; 0 disables
+        self.embedding_pool_threshold = 512  # Smallest batch sent to the worker pool
+        self.embedding_cache_size = 10000
+        self.embedding_cache_on_disk = True
+        self.search_mode = "vector"
+        self.search_cache_size = 256
+        self.write_behind = True
+        self.write_queue_size = 1000
+        self.warm_up_on_start = True  # Load the embedding model in the background at startup
+        self.vector_backend = "chroma"  # "chroma" or "flat" (memory-mapped brute force)
+        self.vector_dtype = "float32"  # Flat backend storage: "float32" or "float16"
 
     def initialize(self):
         """Initialize the memory component and all subcomponents"""
@@ -39,8 +83,43 @@ class MemoryComponent(Component):
 
         self.logger.info("Initializing Memory Component")
 
+        # Apply saved memory settings
+        config = self.engine.get_component("config")
+        if config:
+            for key, value in config.get_section("memory").items():
+                if key in self.SETTINGS:
+                    setattr(self, key, value)
+                else:
+                    self.logger.warning(f"Ignoring unknown memory setting: {key}")
+
         # Initialize the memory manager
-        self.memory_manager = MemoryManager(self.persist_directory)
+        cache_dir = None
+        if self.embedding_cache_on_disk:
+            cache_dir = os.path.join(self.persist_directory, "embedding_cache")
+
+        # Use the process-wide manager so nothing else opens a second one
+        # over the same files
+        configured = shared_memory_manager.configure(
+            self.persist_directory,
+            embedding_backend=self.embedding_backend,
+            embedding_batch_size=self.embedding_batch_size,
+            embedding_cache_size=self.embedding_cache_size,
+            embedding_cache_dir=cache_dir,
+            embedding_workers=self.embedding_workers,
+            embedding_pool_threshold=self.embedding_pool_threshold,
+            vector_backend=self.vector_backend,
+            vector_dtype=self.vector_dtype
+        )
+        if not configured:
+            self.logger.warning("Memory manager already created; its settings change on the next start")
+        self.memory_manager = get_memory_manager()
+
+        # Load the model off the startup path so the UI can appear right away
+        self.ready = Future()
+        if self.warm_up_on_start:
+            threading.Thread(target=self._warm_up, name="memory-warm-up", daemon=True).start()
+        else:
+            self.ready.set_result(False)
 
         # Get model interface from engine
         self.model_interface = self.engine.get_component("model")
@@ -49,7 +128,12 @@ class MemoryComponent(Component):
 
         # Initialize subcomponents that need the model interface
         if self.model_interface:
-            self.importance_scorer = MemoryImportanceScorer(self.memory_manager, self.model_interface)
+            self.importance_scorer = MemoryImportanceScorer(
+                self.memory_manager,
+                self.model_interface,
+                batch_size=self.importance_batch_size,
+                batch_token_budget=self.importance_batch_tokens
+            )
             self.consolidator = MemoryConsolidator(self.memory_manager, self.model_interface)
 
         # Initialize visualization and pruning
@@ -58,8 +142,17 @@ class MemoryComponent(Component):
         if self.importance_scorer:
             self.pruner = MemoryPruner(self.memory_manager, self.importance_scorer)
 
+        # Persist conversation messages off the caller's thread
+        if self.write_behind:
+            self.writer = MemoryWriteQueue(
+                self.memory_manager,
+                max_pending=self.write_queue_size,
+                batch_size=self.embedding_batch_size,
+                logger=self.logger
+            )
+
         # Initialize thread manager
-        self.thread_manager = ThreadManager(self.memory_manager)
+        self.thread_manager = ThreadManager(self.memory_manager, self.writer)
 
         # Register maintenance tasks (if scheduler available)
         scheduler = self.engine.get_component("scheduler")
@@ -97,11 +190,11 @@ class MemoryComponent(Component):
             else:
                 sanitized_metadata[key] = value
 
-        # Score importance if not provided
+        # Score importance if not provided, storing its components so that
+        # later pruning can rescore without another model call
         if importance is None and self.importance_scorer:
-            importance = self.importance_scorer.score_memory_importance(text, sanitized_metadata)
-
-        if importance is not None:
+            sanitized_metadata.update(self.importance_scorer.importance_metadata(text, sanitized_metadata))
+        elif importance is not None:
             sanitized_metadata["importance"] = importance
 
         # Add to the appropriate collection based on type
@@ -115,11 +208,84 @@ class MemoryComponent(Component):
             self.logger.warning(f"Unknown memory type: {memory_type}, using episodic")
             return self.memory_manager.add_episodic_memory(text, sanitized_metadata)
 
-    def search_memories(self, query, memory_type=None, n_results=5, metadata_filter=None):
-        """Search memories with optional type filtering"""
+    def add_memories_bulk(self, texts, memory_type="episodic", metadatas=None, importances=None):
+        """Add many memories of one type with a single batched write"""
+        if not texts or not self.memory_manager:
+            return []
+
+        if metadatas is None:
+            metadatas = [None] * len(texts)
+        if importances is None:
+            importances = [None] * len(texts)
+
+        if memory_type not in ("episodic", "semantic", "procedural"):
+            self.logger.warning(f"Unknown memory type: {memory_type}, using episodic")
+            memory_type = "episodic"
+
+        sanitized_metadatas = []
+        to_score = []
+        for i, (text, metadata, importance) in enumerate(zip(texts, metadatas, importances)):
+            sanitized_metadata = self.memory_manager.sanitize_metadata(metadata)
+
+            # Score importance if not provided, keeping the components
+            if importance is None and text and self.importance_scorer:
+                to_score.append(i)
+            elif importance is not None:
+                sanitized_metadata["importance"] = importance
+            sanitized_metadatas.append(sanitized_metadata)
+
+        # Many memories per model call rather than one call each
+        if to_score:
+            all_fields = self.importance_scorer.importance_metadata_batch(
+                [texts[i] for i in to_score],
+                [sanitized_metadatas[i] for i in to_score]
+            )
+            for i, fields in zip(to_score, all_fields):
+                sanitized_metadatas[i].update(fields)
+
+        return self.memory_manager.add_memories_bulk(texts, sanitized_metadatas, memory_type=memory_type)
+
+    def search_memories(self, query, memory_type=None, n_results=5, metadata_filter=None, mode=None):
+        """Search memories with optional type filtering
+
+        mode picks the retrieval strategy: "vector", "lexical", "hybrid" or
+        "auto" (see MemoryManager.hybrid_search); None uses search_mode.
+        """
         if not query or not self.memory_manager:
             return []
 
+        mode = mode or self.search_mode
+        if memory_type not in ("episodic", "semantic", "procedural"):
+            memory_type = None  # Anything else searches all types
+
+        # Serve repeated searches from the cache while no write has touched
+        # the collections they cover
+        key = (query, memory_type, n_results, json.dumps(metadata_filter, sort_keys=True, default=str), mode)
+        generations = self.memory_manager.get_generations(memory_type)
+        with self._search_cache_lock:
+            cached = self._search_cache.get(key)
+            if cached is not None and cached[0] == generations:
+                self._search_cache.move_to_end(key)
+                self.search_cache_hits += 1
+                # Deep copies: callers must not reach the cached metadata dicts
+                return copy.deepcopy(cached[1])
+            self.search_cache_misses += 1
+
+        results = self._run_search(query, memory_type, n_results, metadata_filter, mode)
+
+        with self._search_cache_lock:
+            self._search_cache[key] = (generations, copy.deepcopy(results))
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > self.search_cache_size:
+                self._search_cache.popitem(last=False)
+
+        return results
+
+    def _run_search(self, query, memory_type, n_results, metadata_filter, mode):
+        """Run a search against the memory manager without caching"""
+        if mode != "vector":
+            return self.memory_manager.hybrid_search(query, n_results, memory_type, metadata_filter, mode)
+
         if memory_type == "episodic":
             return self.memory_manager.search_episodic_memory(query, n_results)
         elif memory_type == "semantic":
@@ -129,6 +295,18 @@ class MemoryComponent(Component):
         else:
             return self.memory_manager.search_all_memories(query, n_results)
 
+    def clear_search_cache(self):
+        """Drop all cached search results"""
+        with self._search_cache_lock:
+            self._search_cache.clear()
+
+    def search_many(self, queries, memory_type=None, n_results=5, metadata_filter=None):
+        """Search several queries in one batch, one result list per query"""
+        if not queries or not self.memory_manager:
+            return []
+
+        return self.memory_manager.search_many(queries, n_results, memory_type, metadata_filter)
+
     def get_memory_by_id(self, memory_id):
         """Get a specific memory by ID"""
         if not memory_id or not self.memory_manager:
@@ -198,10 +376,19 @@ class MemoryComponent(Component):
             return "Consolidator not available"
 
         self.logger.info("Running memory consolidation")
-        result = self.consolidator.consolidate_old_memories(days_threshold=self.consolidation_days)
+        result = self.consolidator.consolidate_old_memories(
+            days_threshold=self.consolidation_days,
+            incremental=self._incremental(self.consolidator.CONSOLIDATE_JOB)
+        )
         self.logger.info(f"Consolidation complete: {result}")
         return result
 
+    def _incremental(self, job):
+        """Whether a maintenance job may resume from its watermarks this time"""
+        # Periodic full runs pick up rows written with back-dated timestamps
+        # and changes to the thresholds
+        return not self.memory_manager.maintenance_state.full_run_due(job, self.full_maintenance_days)
+
     def run_pruning(self):
         """Run the memory pruning process"""
         if not self.pruner:
@@ -212,7 +399,8 @@ class MemoryComponent(Component):
         # Prune old memories
         old_result = self.pruner.prune_old_memories(
             days_threshold=self.pruning_days,
-            importance_threshold=self.importance_threshold
+            importance_threshold=self.importance_threshold,
+            incremental=self._incremental(self.pruner.PRUNE_OLD_JOB)
         )
         self.logger.info(f"Old memory pruning: {old_result}")
 
@@ -222,7 +410,47 @@ class MemoryComponent(Component):
 
         return f"{old_result}; {dup_result}"
 
+    def get_embedding_cache_stats(self):
+        """Get embedding cache hit/miss counters"""
+        if not self.memory_manager:
+            return None
+
+        return self.memory_manager.embedding_function.cache_stats()
+
+    def _warm_up(self):
+        start = time.perf_counter()
+        try:
+            self.memory_manager.warm_up()
+        except Exception as e:
+            # Not fatal: the model will load on first use instead
+            self.logger.error(f"Error warming up embedding model: {e}")
+            self.ready.set_exception(e)
+            return
+        self.logger.info(f"Embedding model warmed up in {time.perf_counter() - start:.1f}s")
+        self.ready.set_result(True)
+
+    def is_ready(self):
+        """Whether the background warm-up has finished (successfully or not)"""
+        return self.ready is not None and self.ready.done()
+
+    def wait_until_ready(self, timeout=None):
+        """Block until warm-up finishes; returns False on timeout"""
+        if self.ready is None:
+            return False
+        done, _ = wait([self.ready], timeout)
+        return bool(done)
+
+    def flush(self, timeout=None):
+        """Wait for queued memory writes to be persisted, then save the indexes"""
+        flushed = self.writer.flush(timeout) if self.writer else True
+        if self.memory_manager:
+            self.memory_manager.save_indexes()
+        return flushed
+
     def shutdown(self):
         """Shutdown the memory component"""
         self.logger.info("Shutting down Memory Component")
-        # Any cleanup needed before shutdown
\ No newline at end of file
+        if self.writer:
+            self.writer.close()
+        if self.memory_manager:
+            self.memory_manager.close()
\ No newline at end of file
@@ -3,50 +3,87 @@ from datetime import datetime, timedelta
 
 
 class MemoryConsolidator:
+    # Name of this job in the maintenance state store
+    CONSOLIDATE_JOB = "consolidate_old_memories"
+
     def __init__(self, memory_manager, model_interface):
         self.memory_manager = memory_manager
         self.model_interface = model_interface  # This would be your AI model interface
 
-    def consolidate_old_memories(self, days_threshold=30, batch_size=10):
-        """Consolidate memories older than threshold days"""
+    def consolidate_old_memories(self, days_threshold=30, batch_size=10, page_size=500, incremental=True):
+        """Consolidate memories older than threshold days
+
+        With incremental=True only memories that crossed the cutoff since the
+        previous complete run are visited.
+        """
+        # Finish a replacement whose source deletes failed last time, so
+        # those sources are not summarized a second time
+        self.memory_manager.recover_maintenance()
+
         cutoff_date = datetime.now() - timedelta(days=days_threshold)
         cutoff_str = cutoff_date.isoformat()
+        state = self.memory_manager.maintenance_state
+        collection = self.memory_manager.episodic_collection
+        start = state.watermark(self.CONSOLIDATE_JOB, collection.name) if incremental else None
 
-        # Get old episodic memories
-        old_memories = self.memory_manager.episodic_collection.get(
-            where={"timestamp": {"$lt": cutoff_str}}
+        # Stream old episodic memories a page at a time; consolidated sources
+        # are deleted per page, so the pager is told which ids went away
+        consolidated = set()
+        pages = self.memory_manager.iter_pages(
+            collection,
+            where=self.memory_manager.time_range_filter(start=start, end=cutoff_date),
+            page_size=page_size,
+            deleted=consolidated
         )
 
-        if not old_memories["ids"]:
-            return "No old memories to consolidate"
+        for page in pages:
+            summaries = []
+            summary_metadatas = []
+
+            # Process in batches
+            for i in range(0, len(page), batch_size):
+                batch = page[i:i + batch_size]
+                batch_ids = [memory["id"] for memory in batch]
+                batch_docs = [memory["text"] for memory in batch]
+                batch_metadatas = [memory["metadata"] for memory in batch]
 
-        # Process in batches
-        for i in range(0, len(old_memories["ids"]), batch_size):
-            batch_ids = old_memories["ids"][i:i + batch_size]
-            batch_docs = old_memories["documents"][i:i + batch_size]
-            batch_metadatas = old_memories["metadatas"][i:i + batch_size]
+                # Create a summary of this batch
+                combined_text = "\n\n".join(batch_docs)
+                summary_prompt = f"Please summarize these memories concisely, preserving key information:\n\n{combined_text}"
 
-            # Create a summary of this batch
-            combined_text = "\n\n".join(batch_docs)
-            summary_prompt = f"Please summarize these memories concisely, preserving key information:\n\n{combined_text}"
+                summary = self.model_interface.generate_text(summary_prompt)
 
-            summary = self.model_interface.generate_text(summary_prompt)
+                # Create a consolidated memory
+                consolidated_metadata = {
+                    "memory_type": "consolidated_episodic",
+                    "timestamp": datetime.now().isoformat(),
+                    "source_ids": batch_ids,
+                    "source_count": len(batch_ids),
+                    "oldest_source": min(meta.get("timestamp", cutoff_str) for meta in batch_metadatas),
+                    "newest_source": max(meta.get("timestamp", cutoff_str) for meta in batch_metadatas)
+                }
 
-            # Create a consolidated memory
-            consolidated_metadata = {
-                "memory_type": "consolidated_episodic",
-                "timestamp": datetime.now().isoformat(),
-                "source_ids": batch_ids,
-                "source_count": len(batch_ids),
-                "oldest_source": min(meta.get("timestamp", cutoff_str) for meta in batch_metadatas),
-                "newest_source": max(meta.get("timestamp", cutoff_str) for meta in batch_metadatas)
-            }
+                summaries.append(summary)
+                summary_metadatas.append(consolidated_metadata)
 
-            # Store the consolidated memory
-            self.memory_manager.add_semantic_memory(summary, consolidated_metadata)
+            # Write the page's summaries and delete its sources as one unit
+            source_ids = [memory["id"] for memory in page]
+            try:
+                self.memory_manager.replace_memories(
+                    summaries, summary_metadatas, source_ids,
+                    memory_type="semantic", source_type="episodic"
+                )
+            except Exception as e:
+                # Leave the watermark alone so the next run retries this range
+                print(f"Error consolidating memories: {e}")
+                break
+            consolidated.update(source_ids)
+        else:
+            state.advance(self.CONSOLIDATE_JOB, collection.name, cutoff_date.timestamp())
+            if not incremental:
+                state.mark_full_run(self.CONSOLIDATE_JOB)
 
-            # Optionally, remove or archive the old memories
-            for mem_id in batch_ids:
-                self.memory_manager.episodic_collection.delete(ids=[mem_id])
+        if not consolidated:
+            return "No old memories to consolidate"
 
-        return f"Consolidated {len(old_memories['ids'])} old memories"
\ No newline at end of file
+        return f"Consolidated {len(consolidated)} old memories"
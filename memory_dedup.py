@@ -0,0 +1,294 @@
+# memory_dedup.py
+import re
+import time
+import zlib
+
+import numpy as np
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Prime just above 2**32 for the MinHash permutations (a * h + b) % p
+_MINHASH_PRIME = 4294967311
+
+
+class MemoryDeduplicator:
+    """Near-duplicate detection with locality-sensitive hashing.
+
+    One paged pass over a collection keeps only compact signatures per
+    memory: a random-hyperplane SimHash of the embedding (tables * bits
+    bits) and a MinHash of the text's word shingles. Memories are compared
+    only within the buckets of each signature table. Embedding candidates
+    are screened on the SimHash angle estimate, then confirmed with an
+    exact cosine on embeddings fetched by id. Text candidates pass the
+    MinHash Jaccard estimate first, then an exact shingle Jaccard on
+    documents fetched by id. Confirmed pairs are merged into clusters with
+    union-find, and the newest memory of each cluster is kept.
+
+    similarity_threshold is a cosine. The default of 0.975 matches the old
+    pruning rule, squared L2 distance < 0.05 between unit embeddings.
+    """
+
+    def __init__(self, memory_manager, similarity_threshold=0.975, text_threshold=0.9,
+                 tables=16, bits=16, minhash_permutations=32, minhash_bands=8,
+                 screen_slack=0.05, max_bucket=256, seed=0):
+        self.memory_manager = memory_manager
+        self.similarity_threshold = similarity_threshold
+        self.text_threshold = text_threshold  # Jaccard over word shingles; None disables
+        self.tables = tables
+        self.bits = bits
+        self.minhash_permutations = minhash_permutations
+        self.minhash_bands = minhash_bands
+        self.screen_slack = screen_slack  # Head-room for the SimHash angle estimate
+        self.max_bucket = max_bucket  # Larger buckets switch to leader clustering
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        self._minhash_a = rng.integers(1, 2 ** 31, size=minhash_permutations, dtype=np.int64)
+        self._minhash_b = rng.integers(0, _MINHASH_PRIME, size=minhash_permutations, dtype=np.int64)
+        self._planes = None  # Created once the embedding dimension is known
+
+    # Signatures
+
+    def _simhash(self, embeddings):
+        """Packed sign bits of the embeddings against the random hyperplanes."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self._planes is None or self._planes.shape[1] != embeddings.shape[1]:
+            rng = np.random.default_rng(self.seed + 1)
+            self._planes = rng.standard_normal((self.tables * self.bits, embeddings.shape[1])).astype(np.float32)
+        return np.packbits(embeddings @ self._planes.T > 0, axis=1)
+
+    @staticmethod
+    def _shingles(text):
+        """Word 3-shingles of a text; shorter texts give a single shingle."""
+        words = _WORD_PATTERN.findall(text.lower()) if text else []
+        return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))} if words else set()
+
+    def _minhash(self, text):
+        shingles = self._shingles(text)
+        if not shingles:
+            return np.full(self.minhash_permutations, _MINHASH_PRIME, dtype=np.int64)
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.int64)
+        return ((np.outer(hashes, self._minhash_a) + self._minhash_b) % _MINHASH_PRIME).min(axis=0)
+
+    def _scan(self, collection, page_size):
+        """One paged pass collecting ids, timestamps and signatures."""
+        ids, timestamps, simhashes, minhashes = [], [], [], []
+        include = ["documents", "metadatas", "embeddings"]
+        page_embeddings = []
+
+        def flush():
+            if page_embeddings:
+                simhashes.append(self._simhash(page_embeddings))
+                page_embeddings.clear()
+
+        for memory in self.memory_manager.iter_memories(collection, page_size=page_size, include=include):
+            ids.append(memory["id"])
+            timestamps.append(memory["metadata"].get("timestamp", ""))
+            page_embeddings.append(memory["embedding"])
+            if self.text_threshold is not None:
+                minhashes.append(self._minhash(memory["text"]))
+            if len(page_embeddings) >= page_size:
+                flush()
+        flush()
+
+        simhash = np.vstack(simhashes) if simhashes else np.zeros((0, self.tables * self.bits // 8), np.uint8)
+        minhash = np.vstack(minhashes) if minhashes else None
+        return ids, timestamps, simhash, minhash
+
+    # Candidate generation
+
+    @staticmethod
+    def _buckets(keys):
+        """Index arrays of rows sharing a key, for every key seen more than once."""
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        return [order[start:end] for start, end in zip(starts, ends) if end - start > 1]
+
+    def _table_keys(self, simhash, table):
+        # Each table owns `bits` consecutive bits; bits is a multiple of 8
+        width = self.bits // 8
+        key = np.zeros(len(simhash), dtype=np.int64)
+        for byte in simhash[:, table * width:(table + 1) * width].T:
+            key = (key << 8) | byte
+        return key
+
+    def _bucket_pairs(self, rows, features, similar):
+        """Candidate pairs among the rows of one bucket.
+
+        Small buckets are compared all against all. Large ones (a big
+        duplicate cluster or an unlucky hash collision) use leader
+        clustering instead: the first remaining row is compared with the
+        rest, its matches are paired with it and dropped, and so on. That
+        keeps the pair count linear in the bucket size.
+        """
+        if len(rows) <= self.max_bucket:
+            first, second = np.nonzero(np.triu(similar(features, features), k=1))
+            return np.stack([rows[first], rows[second]], axis=1)
+
+        pairs = []
+        remaining = np.arange(len(rows))
+        while len(remaining) > 1:
+            leader, others = remaining[0], remaining[1:]
+            matched = similar(features[leader:leader + 1], features[others])[0]
+            if matched.any():
+                pairs.append(np.stack([np.full(int(matched.sum()), rows[leader]), rows[others[matched]]], axis=1))
+            remaining = others[~matched]
+        return np.vstack(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+
+    def _embedding_candidates(self, simhash):
+        """Pairs (i, j), i < j, whose SimHash angle estimate passes the screen."""
+        total_bits = self.tables * self.bits
+        min_cosine = self.similarity_threshold - self.screen_slack
+
+        def similar(a, b):
+            hamming = (total_bits - a @ b.T) / 2
+            return np.cos(np.pi * hamming / total_bits) >= min_cosine
+
+        pairs = []
+        for table in range(self.tables):
+            for rows in self._buckets(self._table_keys(simhash, table)):
+                signs = np.unpackbits(simhash[rows], axis=1).astype(np.float32) * 2 - 1
+                pairs.append(self._bucket_pairs(rows, signs, similar))
+        return self._unique_pairs(pairs)
+
+    def _text_candidates(self, minhash):
+        """Pairs (i, j), i < j, whose MinHash Jaccard estimate passes text_threshold."""
+        rows_per_band = self.minhash_permutations // self.minhash_bands
+
+        def similar(a, b):
+            return (a[:, None, :] == b[None, :, :]).mean(axis=2) >= self.text_threshold
+
+        # Memories without words share the empty signature; they are not duplicates
+        has_text = minhash[:, 0] != _MINHASH_PRIME
+
+        pairs = []
+        for band in range(self.minhash_bands):
+            columns = minhash[:, band * rows_per_band:(band + 1) * rows_per_band]
+            keys = np.array([hash(row.tobytes()) for row in columns], dtype=np.int64)
+            for rows in self._buckets(keys):
+                rows = rows[has_text[rows]]
+                if len(rows) > 1:
+                    pairs.append(self._bucket_pairs(rows, minhash[rows], similar))
+        return self._unique_pairs(pairs)
+
+    @staticmethod
+    def _unique_pairs(pairs):
+        if not pairs:
+            return np.zeros((0, 2), dtype=np.int64)
+        pairs = np.vstack(pairs)
+        pairs.sort(axis=1)
+        return np.unique(pairs, axis=0)
+
+    def _confirm_embedding_pairs(self, collection, ids, pairs, batch_size=1000):
+        """Keep the candidate pairs whose exact cosine meets the threshold."""
+        if not len(pairs):
+            return pairs
+        needed = np.unique(pairs)
+        vectors = {}
+        for start in range(0, len(needed), batch_size):
+            chunk = [ids[i] for i in needed[start:start + batch_size]]
+            page = collection.get(ids=chunk, include=["embeddings"])
+            for memory_id, embedding in zip(page["ids"], page["embeddings"]):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                vectors[memory_id] = embedding / (np.linalg.norm(embedding) or 1.0)
+
+        confirmed = [
+            (i, j) for i, j in pairs.tolist()
+            if ids[i] in vectors and ids[j] in vectors
+            and float(vectors[ids[i]] @ vectors[ids[j]]) >= self.similarity_threshold
+        ]
+        return np.array(confirmed, dtype=np.int64).reshape(-1, 2)
+
+    def _confirm_text_pairs(self, collection, ids, pairs, batch_size=1000):
+        """Keep the candidate pairs whose exact shingle Jaccard meets text_threshold.
+
+        The MinHash estimate is too coarse near the threshold to delete on.
+        """
+        if not len(pairs):
+            return pairs
+        needed = np.unique(pairs)
+        shingles = {}
+        for start in range(0, len(needed), batch_size):
+            chunk = [ids[i] for i in needed[start:start + batch_size]]
+            page = collection.get(ids=chunk, include=["documents"])
+            for memory_id, text in zip(page["ids"], page["documents"]):
+                shingles[memory_id] = self._shingles(text)
+
+        confirmed = []
+        for i, j in pairs.tolist():
+            first, second = shingles.get(ids[i]), shingles.get(ids[j])
+            if first and second and len(first & second) / len(first | second) >= self.text_threshold:
+                confirmed.append((i, j))
+        return np.array(confirmed, dtype=np.int64).reshape(-1, 2)
+
+    # Clustering
+
+    @staticmethod
+    def _clusters(count, pairs):
+        """Union-find over index pairs; returns the clusters with two or more members."""
+        parent = list(range(count))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in pairs.tolist():
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+
+        groups = {}
+        for i in np.unique(pairs).tolist():
+            groups.setdefault(find(i), []).append(i)
+        return [members for members in groups.values() if len(members) > 1]
+
+    def find_duplicates(self, collection, page_size=1000):
+        """Scan a collection and report its duplicate clusters without deleting.
+
+        The report's "clusters" list holds {"keep", "remove", "size"} per
+        cluster, keeping the newest memory by timestamp.
+        """
+        start = time.perf_counter()
+        ids, timestamps, simhash, minhash = self._scan(collection, page_size)
+
+        embedding_pairs = self._embedding_candidates(simhash)
+        confirmed = self._confirm_embedding_pairs(collection, ids, embedding_pairs)
+        text_candidates = self._text_candidates(minhash) if minhash is not None and len(minhash) else np.zeros((0, 2), np.int64)
+        text_pairs = self._confirm_text_pairs(collection, ids, text_candidates)
+        all_pairs = self._unique_pairs([confirmed, text_pairs])
+
+        clusters = []
+        for members in self._clusters(len(ids), all_pairs):
+            members.sort(key=lambda i: timestamps[i], reverse=True)
+            clusters.append({
+                "keep": ids[members[0]],
+                "remove": [ids[i] for i in members[1:]],
+                "size": len(members),
+            })
+
+        return {
+            "collection": collection.name,
+            "scanned": len(ids),
+            "embedding_candidates": int(len(embedding_pairs)),
+            "embedding_duplicates": int(len(confirmed)),
+            "text_candidates": int(len(text_candidates)),
+            "text_duplicates": int(len(text_pairs)),
+            "clusters": clusters,
+            "duplicates": sum(len(cluster["remove"]) for cluster in clusters),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+    def remove_duplicates(self, collection, page_size=1000, delete_batch_size=500, dry_run=False):
+        """Find duplicate clusters and delete all but the newest of each, in batches."""
+        report = self.find_duplicates(collection, page_size)
+        to_delete = [memory_id for cluster in report["clusters"] for memory_id in cluster["remove"]]
+        if not dry_run:
+            for start in range(0, len(to_delete), delete_batch_size):
+                self.memory_manager.delete_memories(to_delete[start:start + delete_batch_size],
+                                                    collection=collection)
+        report["deleted"] = 0 if dry_run else len(to_delete)
+        return report
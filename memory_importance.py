@@ -1,50 +1,169 @@
 # memory_importance.py
+import json
 import re
 from datetime import datetime
 
 
+# Metadata fields holding the stored, time-independent importance factors
+IMPORTANCE_FIELDS = ("importance_keyword", "importance_emotion", "importance_density", "importance_ai")
+
+# Weight of each factor in the combined 0-100 score
+IMPORTANCE_WEIGHTS = {
+    "importance_keyword": 0.2,
+    "importance_emotion": 0.15,
+    "importance_density": 0.2,
+    "importance_ai": 0.3,
+}
+RECENCY_WEIGHT = 0.15
+
+# Stands in for an AI judgment the model failed to give; never stored
+AI_FALLBACK_SCORE = 50
+
+# Rough characters per token, for budgeting batched scoring prompts
+CHARS_PER_TOKEN = 4
+
+_JSON_ARRAY = re.compile(r"\[.*?\]", re.DOTALL)
+
+
 class MemoryImportanceScorer:
-    def __init__(self, memory_manager, model_interface):
+    def __init__(self, memory_manager, model_interface, batch_size=20, batch_token_budget=3000,
+                 item_token_limit=300):
         self.memory_manager = memory_manager
         self.model_interface = model_interface
+        self.batch_size = batch_size  # Most memories judged by one model call
+        self.batch_token_budget = batch_token_budget  # Rough token budget for the memories of one prompt
+        self.item_token_limit = item_token_limit  # Longer memories are truncated in batched prompts
         self.importance_keywords = [
             "critical", "important", "remember", "key", "significant",
             "essential", "crucial", "vital", "remember this", "don't forget"
         ]
 
     def score_memory_importance(self, text, metadata=None):
-        """Score a memory's importance from 0-100"""
-        if not text:
-            return 0
+        """Score a memory's importance from 0-100
 
-        base_score = 50  # Default importance
+        Memories whose components were stored when they were added are
+        scored without a model call; only recency is recomputed.
+        """
+        return self.score_with_fields(text, metadata)[0]
 
-        # Factor 1: Keywords indicating importance
-        keyword_score = self._calculate_keyword_score(text)
+    def score_with_fields(self, text, metadata=None):
+        """Score a memory, returning (score, fields to store or None)
 
-        # Factor 2: Emotional content
-        emotion_score = self._calculate_emotion_score(text)
+        The fields are only returned when the memory had to be scored from
+        scratch, so callers can persist them and never pay for it again.
+        """
+        return self.score_with_fields_batch([text], [metadata])[0]
 
-        # Factor 3: Information density
-        info_density_score = self._calculate_info_density(text)
+    def score_with_fields_batch(self, texts, metadatas):
+        """score_with_fields for many memories
 
-        # Factor 4: Recency (if timestamp available)
-        recency_score = self._calculate_recency_score(metadata)
+        Memories that were never scored share batched model calls.
+        """
+        results = [None] * len(texts)
+        unscored = []
+        for i, (text, metadata) in enumerate(zip(texts, metadatas)):
+            if not text:
+                results[i] = (0, None)
+                continue
 
-        # Factor 5: AI judgment of importance
-        ai_importance_score = self._calculate_ai_importance(text)
+            components = self.stored_components(metadata)
+            if components is not None:
+                results[i] = (self.combine_components(components, metadata), None)
+                continue
 
-        # Weighted combination
-        final_score = (
-                keyword_score * 0.2 +
-                emotion_score * 0.15 +
-                info_density_score * 0.2 +
-                recency_score * 0.15 +
-                ai_importance_score * 0.3
-        )
+            legacy_score = self._legacy_static_score(metadata)
+            if legacy_score is not None:
+                recency = self._calculate_recency_score(metadata)
+                results[i] = (self._clamp(legacy_score + RECENCY_WEIGHT * recency), None)
+                continue
+
+            unscored.append(i)
+
+        all_fields = self.score_components_batch([texts[i] for i in unscored])
+        for i, fields in zip(unscored, all_fields):
+            # Without the AI judgment the score is provisional; nothing to keep
+            complete = "importance_ai" in fields
+            results[i] = (self.combine_components(fields, metadatas[i]), fields if complete else None)
+        return results
+
+    def score_components(self, text):
+        """Score the factors that do not change over time
+
+        Returns metadata-ready fields: keyword, emotion and density scores,
+        the AI judgment (one model call) and when the scoring happened.
+        "importance_ai" is left out when the model gave no usable answer,
+        so the memory is scored again later instead of keeping a default.
+        """
+        return self.score_components_batch([text])[0]
+
+    def score_components_batch(self, texts):
+        """score_components for many texts, with batched AI judgments"""
+        ai_scores = self._calculate_ai_importance_batch(texts)
+        scored_at = datetime.now().isoformat()
+        all_fields = []
+        for text, ai_score in zip(texts, ai_scores):
+            fields = {
+                "importance_keyword": self._calculate_keyword_score(text),
+                "importance_emotion": self._calculate_emotion_score(text),
+                "importance_density": self._calculate_info_density(text),
+                "importance_scored_at": scored_at,
+            }
+            if ai_score is not None:
+                fields["importance_ai"] = ai_score
+            all_fields.append(fields)
+        return all_fields
+
+    def combine_components(self, components, metadata=None):
+        """Weighted 0-100 score from stored components plus current recency"""
+        # Only the AI judgment can be missing, when the model failed to give one
+        static_score = sum(float(components.get(field, AI_FALLBACK_SCORE)) * weight
+                           for field, weight in IMPORTANCE_WEIGHTS.items())
+        return self._clamp(static_score + RECENCY_WEIGHT * self._calculate_recency_score(metadata))
+
+    def importance_metadata(self, text, metadata=None):
+        """Score a new memory and return the fields to store with it
+
+        That is the components plus the combined "importance". A memory
+        without a timestamp is being added now, so it gets full recency.
+        """
+        return self.importance_metadata_batch([text], [metadata])[0]
+
+    def importance_metadata_batch(self, texts, metadatas):
+        """importance_metadata for many new memories, with batched AI judgments"""
+        all_fields = self.score_components_batch(texts)
+        now = datetime.now().isoformat()
+        for fields, metadata in zip(all_fields, metadatas):
+            if not metadata or "timestamp" not in metadata:
+                metadata = {"timestamp": now}
+            fields["importance"] = self.combine_components(fields, metadata)
+        return all_fields
 
+    def stored_components(self, metadata):
+        """Components saved in a memory's metadata, or None if it has none"""
+        if not metadata or not all(field in metadata for field in IMPORTANCE_FIELDS):
+            return None
+        try:
+            return {field: float(metadata[field]) for field in IMPORTANCE_FIELDS}
+        except (TypeError, ValueError):
+            return None
+
+    def _legacy_static_score(self, metadata):
+        """Time-independent part of a bare "importance" stored by older versions
+
+        Those were scored by add_memory before the memory had a timestamp,
+        so the recency factor contributed its default of 50.
+        """
+        if not metadata or "importance" not in metadata or "importance_scored_at" in metadata:
+            return None  # Current versions store components, possibly awaiting the AI judgment
+        try:
+            return float(metadata["importance"]) - RECENCY_WEIGHT * 50
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _clamp(score):
         # Ensure score is between 0-100
-        return max(0, min(100, final_score))
+        return max(0, min(100, score))
 
     def _calculate_keyword_score(self, text):
         """Calculate score based on importance keywords"""
@@ -98,7 +217,7 @@ class MemoryImportanceScorer:
             return 50  # Default on error
 
     def _calculate_ai_importance(self, text):
-        """Use the AI to judge importance"""
+        """Use the AI to judge importance; None if it gave no usable score"""
         prompt = f"""On a scale of 0-100, how important is the following information to remember?
 
         Text: {text}
@@ -106,6 +225,8 @@ class MemoryImportanceScorer:
         Provide only a numeric score from 0-100:"""
 
         response = self.model_interface.generate_text(prompt)
+        if response.startswith("Error"):
+            return None  # The model call failed; any number in it is not a score
 
         # Try to extract a numeric score from the response
         match = re.search(r'\b(\d{1,3})\b', response)
@@ -113,4 +234,64 @@ class MemoryImportanceScorer:
             score = int(match.group(1))
             return max(0, min(100, score))
         else:
-            return 50  # Default if no clear number found
\ No newline at end of file
+            return None  # No clear number found
+
+    def _calculate_ai_importance_batch(self, texts):
+        """AI judgments for many texts, several per model call"""
+        scores = []
+        for batch in self._ai_batches(texts):
+            if len(batch) == 1:
+                scores.append(self._calculate_ai_importance(batch[0]))
+            else:
+                scores.extend(self._score_ai_batch(batch))
+        return scores
+
+    def _ai_batches(self, texts):
+        """Split texts into consecutive batches within batch_size and the token budget"""
+        batch, batch_tokens = [], 0
+        for text in texts:
+            tokens = min(len(text) // CHARS_PER_TOKEN + 1, self.item_token_limit)
+            if batch and (len(batch) >= self.batch_size or batch_tokens + tokens > self.batch_token_budget):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(text)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _score_ai_batch(self, texts):
+        """Judge several texts in one prompt, falling back per text on bad answers"""
+        max_chars = self.item_token_limit * CHARS_PER_TOKEN
+        items = "\n".join(
+            f"{i + 1}. {json.dumps(text[:max_chars])}" for i, text in enumerate(texts)
+        )
+        prompt = f"""On a scale of 0-100, how important is each of the following {len(texts)} memories to remember?
+
+        Memories:
+        {items}
+
+        Respond with only a JSON array of {len(texts)} numbers, one score per memory, in the same order:"""
+
+        response = self.model_interface.generate_text(prompt)
+        if response.startswith("Error"):
+            # The model call itself failed; retrying each memory would fail too
+            return [None] * len(texts)
+
+        scores = None
+        match = _JSON_ARRAY.search(response)
+        if match:
+            try:
+                scores = json.loads(match.group(0))
+            except ValueError:
+                scores = None
+        if not isinstance(scores, list) or len(scores) != len(texts):
+            # Positions cannot be trusted; ask about each memory on its own
+            scores = [None] * len(texts)
+
+        results = []
+        for text, score in zip(texts, scores):
+            if isinstance(score, (int, float)) and not isinstance(score, bool):
+                results.append(max(0, min(100, score)))
+            else:
+                results.append(self._calculate_ai_importance(text))
+        return results
@@ -1,16 +1,31 @@
 # memory_pruning.py
 from datetime import datetime, timedelta
 
+from memory_dedup import MemoryDeduplicator
+
 
 class MemoryPruner:
+    # Name of the old-memory job in the maintenance state store
+    PRUNE_OLD_JOB = "prune_old_memories"
+
     def __init__(self, memory_manager, importance_scorer):
         self.memory_manager = memory_manager
         self.importance_scorer = importance_scorer
+        self.last_duplicate_reports = []
+
+    def prune_old_memories(self, days_threshold=90, importance_threshold=30, page_size=500, incremental=True):
+        """Remove old, unimportant memories
+
+        With incremental=True only memories that crossed the cutoff since the
+        previous run are scored; older ones were already scored and kept.
+        Memories with stored importance components are rescored without a
+        model call, and the components of newly scored ones are saved.
+        """
+        # Settle half-applied consolidations before scoring what they touched
+        self.memory_manager.recover_maintenance()
 
-    def prune_old_memories(self, days_threshold=90, importance_threshold=30):
-        """Remove old, unimportant memories"""
         cutoff_date = datetime.now() - timedelta(days=days_threshold)
-        cutoff_str = cutoff_date.isoformat()
+        state = self.memory_manager.maintenance_state
 
         # Get old memories from all collections
         collections = [
@@ -22,76 +37,68 @@ class MemoryPruner:
         pruned_count = 0
 
         for collection in collections:
-            old_memories = collection.get(
-                where={"timestamp": {"$lt": cutoff_str}}
+            start = state.watermark(self.PRUNE_OLD_JOB, collection.name) if incremental else None
+
+            # Deletes go out per page; the pager is told which ids went away
+            deleted = set()
+            pages = self.memory_manager.iter_pages(
+                collection,
+                where=self.memory_manager.time_range_filter(start=start, end=cutoff_date),
+                page_size=page_size,
+                deleted=deleted
             )
 
-            if not old_memories["ids"]:
-                continue
+            for page in pages:
+                to_delete = []
+                scored_ids, scored_fields = [], []
+                # Stored components only need recency recomputed; memories
+                # never scored before share batched model calls
+                scores = self.importance_scorer.score_with_fields_batch(
+                    [memory["text"] for memory in page],
+                    [memory["metadata"] for memory in page]
+                )
+                for memory, (importance, fields) in zip(page, scores):
+                    # If below threshold, prune it
+                    if importance < importance_threshold:
+                        to_delete.append(memory["id"])
+                    elif fields is not None:
+                        # Keep the new score so later runs do not pay for it again
+                        scored_ids.append(memory["id"])
+                        scored_fields.append(dict(fields, importance=importance))
 
-            for i, mem_id in enumerate(old_memories["ids"]):
-                text = old_memories["documents"][i]
-                metadata = old_memories["metadatas"][i]
+                self.memory_manager.update_metadatas(scored_ids, scored_fields, collection=collection)
+                self.memory_manager.delete_memories(to_delete, collection=collection)
+                deleted.update(to_delete)
 
-                # Score importance
-                importance = self.importance_scorer.score_memory_importance(text, metadata)
+            pruned_count += len(deleted)
+            state.advance(self.PRUNE_OLD_JOB, collection.name, cutoff_date.timestamp())
 
-                # If below threshold, prune it
-                if importance < importance_threshold:
-                    collection.delete(ids=[mem_id])
-                    pruned_count += 1
+        if not incremental:
+            state.mark_full_run(self.PRUNE_OLD_JOB)
 
         return f"Pruned {pruned_count} low-importance old memories"
 
-    def prune_duplicate_memories(self, similarity_threshold=0.95):
-        """Remove near-duplicate memories"""
+    def prune_duplicate_memories(self, similarity_threshold=0.975, batch_size=500, page_size=1000, dry_run=False):
+        """Remove near-duplicate memories, keeping the newest of each cluster
+
+        similarity_threshold is the embedding cosine above which memories
+        count as duplicates (0.975 is the old squared L2 distance of 0.05).
+        """
+        deduplicator = MemoryDeduplicator(self.memory_manager, similarity_threshold=similarity_threshold)
         collections = [
             self.memory_manager.episodic_collection,
             self.memory_manager.semantic_collection,
             self.memory_manager.procedural_collection
         ]
 
-        pruned_count = 0
-
-        for collection in collections:
-            # Get all memories
-            all_memories = collection.get()
-
-            if not all_memories["ids"]:
-                continue
-
-            # Check each memory against others
-            for i, mem_id in enumerate(all_memories["ids"]):
-                text = all_memories["documents"][i]
-
-                # Skip if already processed
-                if text is None:
-                    continue
-
-                # Search for similar memories
-                similar = collection.query(
-                    query_texts=[text],
-                    n_results=10
-                )
+        # Per-collection cluster reports of the latest sweep, for inspection
+        self.last_duplicate_reports = [
+            deduplicator.remove_duplicates(collection, page_size=page_size,
+                                           delete_batch_size=batch_size, dry_run=dry_run)
+            for collection in collections
+        ]
 
-                # First result is always the same document
-                for j, sim_id in enumerate(similar["ids"][0][1:], 1):  # Skip first (self)
-                    # If similarity above threshold
-                    if similar["distances"][0][j] < (1.0 - similarity_threshold):
-                        # Keep the newer one
-                        idx = all_memories["ids"].index(sim_id)
-                        timestamp1 = all_memories["metadatas"][i].get("timestamp", "")
-                        timestamp2 = all_memories["metadatas"][idx].get("timestamp", "")
-
-                        # If second memory is newer, delete first
-                        if timestamp2 > timestamp1:
-                            collection.delete(ids=[mem_id])
-                        else:
-                            collection.delete(ids=[sim_id])
-                            # Mark as processed to avoid double deletion
-                            all_memories["documents"][idx] = None
-
-                        pruned_count += 1
-                        break
-
-        return f"Pruned {pruned_count} duplicate memories"
\ No newline at end of file
+        pruned_count = sum(report["duplicates"] for report in self.last_duplicate_reports)
+        cluster_count = sum(len(report["clusters"]) for report in self.last_duplicate_reports)
+        verb = "Found" if dry_run else "Pruned"
+        return f"{verb} {pruned_count} duplicate memories in {cluster_count} clusters"
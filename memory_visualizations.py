@@ -22,18 +22,18 @@ class MemoryVisualizer:
                        type=memory["metadata"].get("memory_type", "unknown"))
 
         # Expand graph for each depth level
-        current_ids = [memory["id"] for memory in central_memories]
+        current = {memory["id"]: memory["text"] for memory in central_memories}
 
         for _ in range(depth):
-            next_ids = []
-            for memory_id in current_ids:
-                memory = self.memory_manager.get_memory_by_id(memory_id)
-                if not memory:
-                    continue
+            if not current or len(G.edges) >= max_connections:
+                break
 
-                # Find related memories
-                related = self.memory_manager.search_all_memories(memory["text"], n_results=3)
+            # Find related memories for the whole level in one batched search
+            level_ids = list(current)
+            related_lists = self.memory_manager.search_many([current[i] for i in level_ids], n_results=3)
 
+            next_level = {}
+            for memory_id, related in zip(level_ids, related_lists):
                 for related_memory in related:
                     if related_memory["id"] != memory_id:  # Avoid self-connections
                         # Add node if not exists
@@ -46,13 +46,16 @@ class MemoryVisualizer:
                         similarity = 1.0 - (related_memory.get("distance", 0.5) or 0.5)
                         G.add_edge(memory_id, related_memory["id"], weight=similarity)
 
-                        next_ids.append(related_memory["id"])
+                        next_level[related_memory["id"]] = related_memory["text"]
 
                         # Limit connections
                         if len(G.edges) >= max_connections:
                             break
 
-            current_ids = next_ids
+                if len(G.edges) >= max_connections:
+                    break
+
+            current = next_level
 
         return G
 
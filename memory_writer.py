@@ -0,0 +1,205 @@
+# memory_writer.py
+import queue
+import threading
+import logging
+import uuid
+from collections import namedtuple
+
+# A function queued with MemoryWriteQueue.call
+_Call = namedtuple("_Call", "function args kwargs")
+
+
+class MemoryWriteQueue:
+    """Write-behind queue that persists memories on a dedicated thread.
+
+    Callers enqueue writes and return immediately; the writer thread drains
+    whatever is pending, coalesces it into add_memories_bulk calls and writes
+    them. If a coalesced write fails, its memories are retried one by one so
+    a single bad item does not lose the rest. The queue is bounded, so a
+    stalled writer applies backpressure instead of growing without limit.
+    """
+
+    def __init__(self, memory_manager, max_pending=1000, batch_size=64, logger=None):
+        self.memory_manager = memory_manager
+        self.batch_size = batch_size
+        self.logger = logger or logging.getLogger("memory_writer")
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pending = 0
+        self._enqueuing = 0  # Producers between their _closed check and their put
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, text, metadata=None, id=None, memory_type=None):
+        """Queue a memory to be added."""
+        # Fix the id now so a retried write skips what already landed
+        self._enqueue((text, metadata, id or str(uuid.uuid4()), memory_type, False))
+
+    def upsert(self, text, metadata, id, memory_type=None):
+        """Queue a memory to be added or overwritten by id.
+
+        Pending upserts of the same id are coalesced so only the latest
+        version is written.
+        """
+        self._enqueue((text, metadata, id, memory_type, True))
+
+    def add_bulk(self, texts, metadatas=None, ids=None, memory_type=None):
+        """Queue several memories to be added."""
+        if metadatas is None:
+            metadatas = [None] * len(texts)
+        if ids is None:
+            ids = [None] * len(texts)
+        for text, metadata, memory_id in zip(texts, metadatas, ids):
+            self.add(text, metadata, memory_id, memory_type)
+
+    def call(self, function, *args, **kwargs):
+        """Queue function(*args, **kwargs) to run on the writer thread.
+
+        It runs after the writes queued before it, and flush() waits for it
+        like for a write.
+        """
+        self._enqueue(_Call(function, args, kwargs))
+
+    @property
+    def pending(self):
+        """Number of writes queued or in progress."""
+        with self._condition:
+            return self._pending
+
+    def flush(self, timeout=None):
+        """Block until every queued write has been persisted.
+
+        Returns False if the timeout expired first.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self, timeout=None):
+        """Drain pending writes and stop the writer thread."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            # Items accepted before closing must be queued ahead of the stop marker
+            self._condition.wait_for(lambda: self._enqueuing == 0)
+        self._queue.put(None)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._drain_remaining()
+
+    def _enqueue(self, item):
+        with self._condition:
+            closed = self._closed
+            if not closed:
+                self._pending += 1
+                self._enqueuing += 1
+
+        if closed:
+            # Nothing will drain the queue any more, so write through
+            self._write_batch([item])
+            return
+
+        try:
+            self._queue.put(item)
+        finally:
+            with self._condition:
+                self._enqueuing -= 1
+                self._condition.notify_all()
+
+    def _drain_remaining(self):
+        """Write through anything still queued once the writer thread is gone."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is None:
+                continue
+            try:
+                self._write_batch([item])
+            except Exception as e:
+                self.logger.error(f"Error writing memories: {e}")
+            finally:
+                with self._condition:
+                    self._pending -= 1
+                    self._condition.notify_all()
+
+    def _run(self):
+        stopping = False
+        while True:
+            try:
+                # Once close() has been requested, only drain what is left
+                item = self._queue.get_nowait() if stopping else self._queue.get()
+            except queue.Empty:
+                return
+            if item is None:
+                stopping = True
+                continue
+
+            # Coalesce everything already waiting into one batch
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    continue
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self.logger.error(f"Error writing memories: {e}")
+            finally:
+                with self._condition:
+                    self._pending -= len(batch)
+                    self._condition.notify_all()
+
+    def _write_batch(self, batch):
+        """Write a batch in queue order, coalescing the writes between calls."""
+        writes = []
+        for item in batch:
+            if isinstance(item, _Call):
+                self._write_coalesced(writes)
+                writes = []
+                try:
+                    item.function(*item.args, **item.kwargs)
+                except Exception as e:
+                    self.logger.error(f"Error in queued memory call: {e}")
+            else:
+                writes.append(item)
+        self._write_coalesced(writes)
+
+    def _write_coalesced(self, writes):
+        """Group writes by memory type and write mode, then write each group."""
+        groups = {}
+        for text, metadata, memory_id, memory_type, upsert in writes:
+            group = groups.setdefault((memory_type, upsert), {})
+            # Upserts of the same id keep only the latest version
+            key = memory_id if upsert else len(group)
+            group[key] = (text, metadata, memory_id)
+
+        for (memory_type, upsert), entries in groups.items():
+            texts, metadatas, ids = zip(*entries.values())
+            try:
+                self.memory_manager.add_memories_bulk(
+                    list(texts), list(metadatas), list(ids),
+                    memory_type=memory_type,
+                    upsert=upsert
+                )
+            except Exception as e:
+                self.logger.error(f"Error writing {len(texts)} memories, retrying one by one: {e}")
+                for text, metadata, memory_id in entries.values():
+                    try:
+                        self.memory_manager.add_memories_bulk(
+                            [text], [metadata], [memory_id],
+                            memory_type=memory_type,
+                            upsert=upsert
+                        )
+                    except Exception as e:
+                        self.logger.error(f"Dropping memory {memory_id}: {e}")
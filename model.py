@@ -150,8 +150,7 @@ class ModelComponent(Component):
                 thread_manager = getattr(memory, "thread_manager", None)
                 if thread_manager:
                     thread = self.get_or_create_thread(thread_manager)
-                    thread.add_message(message, "user")
-                    thread.add_message(return_text, "ai")
+                    thread.add_messages([(message, "user"), (return_text, "ai")])
                     thread.save_thread_metadata()  # Save after *each* message
                 else:
                     memory.add_memory(message, "episodic", {"speaker": "user"})
@@ -0,0 +1,73 @@
+# recency_index.py
+import json
+import os
+import threading
+from collections import deque
+
+
+class RecencyRing:
+    """Bounded, persisted ring of the most recent entries.
+
+    Entries are kept in memory in a deque and appended to a JSON-lines
+    file. The file is compacted back to the ring size once it reaches
+    twice that, so loading it never reads more than 2 * size lines.
+    """
+
+    def __init__(self, path, size=500):
+        self.path = path
+        self.size = size
+        self._entries = deque(maxlen=size)
+        self._lines_on_disk = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                lines = f.readlines()
+        except Exception as e:
+            print(f"Error loading recency index: {e}")
+            return
+
+        self._lines_on_disk = len(lines)
+        for line in lines[-self.size:]:
+            try:
+                self._entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from a crash is simply skipped
+                continue
+
+        # Rewrite a torn tail so the next append starts on a fresh line
+        if lines and not lines[-1].endswith("\n"):
+            self._compact()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def append(self, entry):
+        """Add an entry as the newest one."""
+        with self._lock:
+            self._entries.append(entry)
+            try:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+                self._lines_on_disk += 1
+                if self._lines_on_disk >= 2 * self.size:
+                    self._compact()
+            except Exception as e:
+                print(f"Error writing recency index: {e}")
+
+    def latest(self, limit=10):
+        """Return up to `limit` entries, newest first."""
+        with self._lock:
+            count = min(limit, len(self._entries))
+            return [self._entries[-1 - i] for i in range(count)]
+
+    def _compact(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in self._entries)
+        os.replace(tmp_path, self.path)
+        self._lines_on_disk = len(self._entries)
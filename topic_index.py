@@ -0,0 +1,146 @@
+# topic_index.py
+import json
+import os
+import threading
+
+
+class TopicIndex:
+    """Inverted index from topic to the memories mentioning it.
+
+    Each memory is recorded with its collection name and per-topic counts,
+    so a topic lookup is a dictionary hit that yields ids ready for a single
+    collection.get(ids=...). The index is saved as JSON next to the Chroma
+    data on save(), which the owner calls on flush and close; saving after
+    every few changes would rewrite the whole file each time and make bulk
+    ingest quadratic. A `.dirty` marker exists while changes are unsaved,
+    so an unclean exit shows up as is_stale on the next load and the index
+    is rebuilt from the collections.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._memories = {}  # memory id -> {"collection": name, "topics": {topic: count}}
+        self._postings = {}  # topic -> {memory id: count}
+        self._dirty = os.path.exists(self.dirty_path)
+        self._stale = self._dirty  # Unsaved changes from a previous run
+        self.load()
+
+    @property
+    def exists_on_disk(self):
+        """Whether a saved index file is present."""
+        return os.path.exists(self.path)
+
+    @property
+    def dirty_path(self):
+        """Marker present while the index holds changes not yet saved."""
+        return f"{self.path}.dirty"
+
+    @property
+    def is_stale(self):
+        """Whether the saved index missed changes, because the last run ended without saving."""
+        return self._stale
+
+    def load(self):
+        """Load the index from disk, if it has been saved before."""
+        if not self.exists_on_disk:
+            return
+        try:
+            with open(self.path, "r") as f:
+                memories = json.load(f).get("memories", {})
+        except Exception as e:
+            print(f"Error loading topic index: {e}")
+            return
+
+        with self._lock:
+            self._memories = {}
+            self._postings = {}
+            for memory_id, entry in memories.items():
+                self._insert(memory_id, entry["collection"], entry["topics"])
+
+    def save(self):
+        """Write the index to disk atomically."""
+        with self._lock:
+            data = {"memories": self._memories}
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self._stale = False
+            if self._dirty:
+                try:
+                    os.remove(self.dirty_path)
+                except FileNotFoundError:
+                    pass  # Another process on this directory saved first
+                self._dirty = False
+
+    def add(self, memory_id, collection_name, topics):
+        """Index a memory's topics ({topic: count}), replacing any old entry."""
+        with self._lock:
+            self._remove(memory_id)
+            if topics:
+                self._insert(memory_id, collection_name, topics)
+            self._changed()
+
+    def add_many(self, collection_name, memory_ids, topics_list):
+        """Index several memories of one collection at once."""
+        with self._lock:
+            for memory_id, topics in zip(memory_ids, topics_list):
+                self._remove(memory_id)
+                if topics:
+                    self._insert(memory_id, collection_name, topics)
+            self._changed()
+
+    def remove(self, memory_ids):
+        """Drop memories from the index."""
+        with self._lock:
+            for memory_id in memory_ids:
+                self._remove(memory_id)
+            self._changed()
+
+    def clear(self):
+        """Empty the index."""
+        with self._lock:
+            self._memories = {}
+            self._postings = {}
+            self._changed()
+
+    def lookup(self, topic, limit=None):
+        """Return (memory id, collection name, count) for a topic, highest count first."""
+        with self._lock:
+            postings = self._postings.get(topic.lower().strip(), {})
+            ranked = sorted(postings.items(), key=lambda item: item[1], reverse=True)
+            if limit is not None:
+                ranked = ranked[:limit]
+            return [(memory_id, self._memories[memory_id]["collection"], count)
+                    for memory_id, count in ranked]
+
+    def topic_counts(self):
+        """Return how many memories mention each topic."""
+        with self._lock:
+            return {topic: len(postings) for topic, postings in self._postings.items()}
+
+    def _insert(self, memory_id, collection_name, topics):
+        topics = {str(topic).lower().strip(): int(count) for topic, count in topics.items()}
+        self._memories[memory_id] = {"collection": collection_name, "topics": topics}
+        for topic, count in topics.items():
+            self._postings.setdefault(topic, {})[memory_id] = count
+
+    def _remove(self, memory_id):
+        entry = self._memories.pop(memory_id, None)
+        if not entry:
+            return
+        for topic in entry["topics"]:
+            postings = self._postings.get(topic)
+            if postings is None:
+                continue
+            postings.pop(memory_id, None)
+            if not postings:
+                del self._postings[topic]
+
+    def _changed(self):
+        if not self._dirty:
+            # Left behind by a crash, this tells the next load to rebuild
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            open(self.dirty_path, "w").close()
+            self._dirty = True
@@ -0,0 +1,572 @@
+# vector_store.py
+import json
+import os
+import threading
+
+import numpy as np
+
+
+class VectorStore:
+    """Collection interface MemoryManager builds on.
+
+    The methods mirror the subset of Chroma's Collection API the memory
+    code uses (add/upsert/update/get/query/delete/count) and return results
+    in the same dict layout, so backends are interchangeable.
+    """
+
+    name = None
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        raise NotImplementedError
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        raise NotImplementedError
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        raise NotImplementedError
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        raise NotImplementedError
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None):
+        raise NotImplementedError
+
+    def delete(self, ids=None, where=None):
+        raise NotImplementedError
+
+    def count(self):
+        raise NotImplementedError
+
+    def close(self):
+        """Flush and release backend resources."""
+        pass
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a Chroma collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        self.collection.add(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        self.collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        self.collection.update(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        kwargs = {"ids": ids, "where": where, "limit": limit, "offset": offset}
+        if include is not None:
+            kwargs["include"] = include
+        return self.collection.get(**kwargs)
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None):
+        kwargs = {"query_embeddings": query_embeddings, "query_texts": query_texts,
+                  "n_results": n_results, "where": where}
+        if include is not None:
+            kwargs["include"] = include
+        return self.collection.query(**kwargs)
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def count(self):
+        return self.collection.count()
+
+
+class FlatVectorStore(VectorStore):
+    """Brute-force vector store over a memory-mapped matrix.
+
+    Embeddings are L2-normalized and appended to `vectors.bin` as float32
+    or float16 rows; ids, documents and metadata live in an append-only
+    JSON-lines sidecar that is replayed on load. Updates append a new row
+    and tombstone the old one, and compact() rewrites both files without
+    dead rows. A query is one matrix product plus argpartition, and
+    distances are cosine distances (1 - cosine similarity).
+
+    compact() writes the next generation of both files under new names and
+    then switches to them by replacing `meta.json`, so a crash leaves
+    either the old pair or the new pair in use, never a mix.
+    """
+
+    def __init__(self, directory, name, embedding_function=None, dtype="float32"):
+        self.directory = os.path.join(directory, name)
+        self.name = name
+        self.embedding_function = embedding_function
+        os.makedirs(self.directory, exist_ok=True)
+
+        self.meta_path = os.path.join(self.directory, "meta.json")
+        self.generation = 0  # Bumped by every compaction
+        self.vectors_path, self.records_path = self._data_paths(self.generation)
+
+        self._lock = threading.RLock()
+        self.dtype = np.dtype(dtype)
+        self.dimension = None
+        self._rows = {}  # id -> row
+        self._ids = []  # row -> id
+        self._documents = []  # row -> document
+        self._metadatas = []  # row -> metadata
+        self._alive = np.zeros(0, dtype=bool)
+        self._columns = {}  # metadata key -> row -> numeric value or NaN, built on first filter
+        self._row_count = 0
+        self._map = None
+        self._load()
+
+    # Loading and persistence
+
+    def _data_paths(self, generation):
+        """Vector and record file names of one compaction generation."""
+        if generation == 0:
+            return (os.path.join(self.directory, "vectors.bin"),
+                    os.path.join(self.directory, "records.jsonl"))
+        return (os.path.join(self.directory, f"vectors.{generation}.bin"),
+                os.path.join(self.directory, f"records.{generation}.jsonl"))
+
+    def _save_meta(self):
+        tmp_path = f"{self.meta_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dimension": self.dimension, "dtype": self.dtype.name,
+                       "generation": self.generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+
+    def _remove_stale_generations(self):
+        """Delete data files of other generations, left by a crashed compaction."""
+        current = {os.path.basename(path) for path in (self.vectors_path, self.records_path)}
+        for name in os.listdir(self.directory):
+            if name.startswith(("vectors.", "records.")) and name not in current:
+                os.remove(os.path.join(self.directory, name))
+
+    def _load(self):
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                meta = json.load(f)
+            self.dimension = meta["dimension"]
+            self.dtype = np.dtype(meta["dtype"])
+            self.generation = meta.get("generation", 0)
+            self.vectors_path, self.records_path = self._data_paths(self.generation)
+        self._remove_stale_generations()
+
+        stored_rows = 0
+        if self.dimension and os.path.exists(self.vectors_path):
+            stored_rows = os.path.getsize(self.vectors_path) // (self.dimension * self.dtype.itemsize)
+
+        if os.path.exists(self.records_path):
+            with open(self.records_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Torn final line
+                    self._replay(record, stored_rows)
+
+        # Rows written to the vector file but never recorded are dead weight
+        self._row_count = max(self._row_count, stored_rows)
+        self._ensure_capacity(self._row_count)
+
+    def _replay(self, record, stored_rows):
+        op = record["op"]
+        if op == "put":
+            row = record["row"]
+            if row >= stored_rows:
+                return  # Vector never made it to disk
+            self._set_row(record["id"], row, record["document"], record["metadata"])
+        elif op == "meta":
+            row = self._rows.get(record["id"])
+            if row is not None:
+                self._documents[row] = record["document"]
+                self._set_metadata(row, record["metadata"])
+        elif op == "delete":
+            self._kill(record["id"])
+
+    def _append_records(self, records):
+        with open(self.records_path, "a") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+
+    def _append_vectors(self, vectors):
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+            self._save_meta()
+        with open(self.vectors_path, "ab") as f:
+            f.write(vectors.astype(self.dtype).tobytes())
+
+    def _matrix(self):
+        """Memory map of every stored row, remapped after appends."""
+        if self._row_count == 0:
+            return None
+        if self._map is None or self._map.shape[0] != self._row_count:
+            self._map = np.memmap(self.vectors_path, dtype=self.dtype, mode="r",
+                                  shape=(self._row_count, self.dimension))
+        return self._map
+
+    # Row bookkeeping
+
+    def _ensure_capacity(self, rows):
+        if rows > len(self._alive):
+            grown = np.zeros(max(rows, 2 * len(self._alive), 1024), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+            for key, column in self._columns.items():
+                self._columns[key] = np.concatenate([column, np.full(len(grown) - len(column), np.nan)])
+        while len(self._ids) < rows:
+            self._ids.append(None)
+            self._documents.append(None)
+            self._metadatas.append(None)
+
+    def _set_row(self, memory_id, row, document, metadata):
+        self._ensure_capacity(row + 1)
+        self._row_count = max(self._row_count, row + 1)
+        old_row = self._rows.get(memory_id)
+        if old_row is not None and old_row != row:
+            self._alive[old_row] = False
+        self._rows[memory_id] = row
+        self._ids[row] = memory_id
+        self._documents[row] = document
+        self._set_metadata(row, metadata)
+        self._alive[row] = True
+
+    def _set_metadata(self, row, metadata):
+        self._metadatas[row] = metadata
+        for key, column in self._columns.items():
+            column[row] = _as_number((metadata or {}).get(key))
+
+    def _kill(self, memory_id):
+        row = self._rows.pop(memory_id, None)
+        if row is not None:
+            self._alive[row] = False
+            self._documents[row] = None
+            self._metadatas[row] = None
+
+    def _embed(self, documents, embeddings):
+        if embeddings is not None:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+        elif self.embedding_function is not None:
+            vectors = np.asarray(self.embedding_function(list(documents)), dtype=np.float32)
+        else:
+            raise ValueError("FlatVectorStore needs embeddings or an embedding function")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # Writes
+
+    def add(self, ids, documents=None, metadatas=None, embeddings=None):
+        with self._lock:
+            # Like Chroma, adding an existing id is a no-op
+            keep = [i for i, memory_id in enumerate(ids) if memory_id not in self._rows]
+            self._write(ids, documents, metadatas, embeddings, keep)
+
+    def upsert(self, ids, documents=None, metadatas=None, embeddings=None):
+        with self._lock:
+            self._write(ids, documents, metadatas, embeddings, list(range(len(ids))))
+            self._maybe_compact()
+
+    def _write(self, ids, documents, metadatas, embeddings, keep):
+        if not keep:
+            return
+        ids = [ids[i] for i in keep]
+        documents = [documents[i] for i in keep] if documents is not None else [None] * len(keep)
+        metadatas = [metadatas[i] for i in keep] if metadatas is not None else [None] * len(keep)
+        if embeddings is not None:
+            embeddings = [embeddings[i] for i in keep]
+
+        vectors = self._embed(documents, embeddings)
+        self._append_vectors(vectors)
+
+        start = self._row_count
+        records = []
+        for offset, (memory_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+            row = start + offset
+            self._set_row(memory_id, row, document, metadata)
+            records.append({"op": "put", "id": memory_id, "row": row,
+                            "document": document, "metadata": metadata})
+        self._append_records(records)
+
+    def update(self, ids, documents=None, metadatas=None, embeddings=None):
+        with self._lock:
+            present = [i for i, memory_id in enumerate(ids) if memory_id in self._rows]
+            if not present:
+                return
+
+            merged_metadatas = []
+            new_documents = []
+            for i in present:
+                row = self._rows[ids[i]]
+                metadata = dict(self._metadatas[row] or {})
+                if metadatas is not None and metadatas[i] is not None:
+                    # Like Chroma, a None value removes the key
+                    for key, value in metadatas[i].items():
+                        if value is None:
+                            metadata.pop(key, None)
+                        else:
+                            metadata[key] = value
+                merged_metadatas.append(metadata)
+                new_documents.append(documents[i] if documents is not None else self._documents[row])
+
+            present_ids = [ids[i] for i in present]
+            if documents is not None or embeddings is not None:
+                # New content needs a new vector: append and tombstone the old row
+                present_embeddings = [embeddings[i] for i in present] if embeddings is not None else None
+                self._write(present_ids, new_documents, merged_metadatas, present_embeddings,
+                            list(range(len(present_ids))))
+                self._maybe_compact()
+                return
+
+            records = []
+            for memory_id, document, metadata in zip(present_ids, new_documents, merged_metadatas):
+                row = self._rows[memory_id]
+                self._set_metadata(row, metadata)
+                records.append({"op": "meta", "id": memory_id, "document": document, "metadata": metadata})
+            self._append_records(records)
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            if ids is None:
+                ids = self.get(where=where, include=[])["ids"]
+            elif where is not None:
+                ids = self.get(ids=ids, where=where, include=[])["ids"]
+
+            records = []
+            for memory_id in ids:
+                if memory_id in self._rows:
+                    self._kill(memory_id)
+                    records.append({"op": "delete", "id": memory_id})
+            if records:
+                self._append_records(records)
+            self._maybe_compact()
+
+    # Reads
+
+    def count(self):
+        with self._lock:
+            return len(self._rows)
+
+    def _column(self, key):
+        """Numeric values of one metadata key per row, NaN where absent or not a number."""
+        column = self._columns.get(key)
+        if column is None:
+            column = np.full(len(self._alive), np.nan)
+            for row in np.flatnonzero(self._alive[:self._row_count]):
+                column[row] = _as_number((self._metadatas[row] or {}).get(key))
+            self._columns[key] = column
+        return column
+
+    def _narrow(self, mask, where):
+        """AND the numeric range conditions of a where clause into mask.
+
+        Returns the clauses that still need evaluating row by row.
+        """
+        residual = []
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    residual.extend(self._narrow(mask, clause))
+            elif key != "$or" and isinstance(condition, dict):
+                rest = {}
+                for op, target in condition.items():
+                    if op in _RANGE_OPS and isinstance(target, (int, float)):
+                        # NaN compares False, as _compare does for missing or non-numeric values
+                        mask &= _RANGE_OPS[op](self._column(key)[:len(mask)], target)
+                    else:
+                        rest[op] = target
+                if rest:
+                    residual.append({key: rest})
+            else:
+                residual.append({key: condition})
+        return residual
+
+    def _where_mask(self, where):
+        """Boolean mask of live rows matching a Chroma-style where clause.
+
+        Range conditions on numbers (such as ts_epoch) are vectorized; the
+        rest is checked per row, only on rows the ranges left in.
+        """
+        mask = self._alive[:self._row_count].copy()
+        if where:
+            residual = self._narrow(mask, where)
+            if residual:
+                where = {"$and": residual}
+                for row in np.flatnonzero(mask):
+                    if not matches_where(self._metadatas[row] or {}, where):
+                        mask[row] = False
+        return mask
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=None):
+        include = ["documents", "metadatas"] if include is None else include
+        with self._lock:
+            if ids is not None:
+                rows = [self._rows[memory_id] for memory_id in ids if memory_id in self._rows]
+                if where:
+                    rows = [row for row in rows if matches_where(self._metadatas[row] or {}, where)]
+            else:
+                # Slice before converting: a page should not cost a list of every row
+                rows = np.flatnonzero(self._where_mask(where))
+
+            start = offset or 0
+            rows = rows[start:start + limit] if limit is not None else rows[start:]
+            return self._result(rows.tolist() if isinstance(rows, np.ndarray) else rows, include)
+
+    def _result(self, rows, include):
+        result = {"ids": [self._ids[row] for row in rows]}
+        result["documents"] = [self._documents[row] for row in rows] if "documents" in include else None
+        result["metadatas"] = [self._metadatas[row] for row in rows] if "metadatas" in include else None
+        if "embeddings" in include:
+            matrix = self._matrix()
+            result["embeddings"] = np.asarray(matrix[rows], dtype=np.float32) if rows else []
+        else:
+            result["embeddings"] = None
+        return result
+
+    def query(self, query_embeddings=None, query_texts=None, n_results=10, where=None, include=None):
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+        queries = self._embed(None, query_embeddings)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": None}
+        with self._lock:
+            matrix = self._matrix()
+            mask = self._where_mask(where) if matrix is not None else None
+            if matrix is None or not mask.any():
+                for _ in range(len(queries)):
+                    for key in ("ids", "documents", "metadatas", "distances"):
+                        results[key].append([])
+                return results
+
+            similarities = self._similarities(matrix, queries)
+            similarities[~mask] = -np.inf
+            k = min(n_results, int(mask.sum()))
+
+            for column in range(similarities.shape[1]):
+                scores = similarities[:, column]
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])].tolist()
+                part = self._result(top, include)
+                results["ids"].append(part["ids"])
+                results["documents"].append(part["documents"] or [])
+                results["metadatas"].append(part["metadatas"] or [])
+                results["distances"].append((1.0 - scores[top]).tolist())
+        return results
+
+    def _similarities(self, matrix, queries, chunk_rows=65536):
+        """Cosine similarities of every stored row against every query."""
+        if self.dtype == np.float32:
+            return np.asarray(matrix @ queries.T)
+        # Half-precision rows are widened a chunk at a time for BLAS
+        out = np.empty((matrix.shape[0], queries.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], chunk_rows):
+            chunk = np.asarray(matrix[start:start + chunk_rows], dtype=np.float32)
+            out[start:start + chunk_rows] = chunk @ queries.T
+        return out
+
+    # Maintenance
+
+    def _maybe_compact(self):
+        dead = self._row_count - len(self._rows)
+        if dead > 1000 and dead > len(self._rows):
+            self.compact()
+
+    def compact(self):
+        """Rewrite the vector file and sidecar without dead rows."""
+        with self._lock:
+            live_rows = np.flatnonzero(self._alive[:self._row_count]).tolist()
+            matrix = self._matrix()
+
+            old_paths = (self.vectors_path, self.records_path)
+            generation = self.generation + 1
+            vectors_path, records_path = self._data_paths(generation)
+            with open(vectors_path, "wb") as f:
+                for start in range(0, len(live_rows), 65536):
+                    f.write(np.asarray(matrix[live_rows[start:start + 65536]], dtype=self.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(records_path, "w") as f:
+                for new_row, row in enumerate(live_rows):
+                    f.write(json.dumps({"op": "put", "id": self._ids[row], "row": new_row,
+                                        "document": self._documents[row],
+                                        "metadata": self._metadatas[row]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            # The meta.json replace is the single switch between generations;
+            # until it lands, a reopened store still reads the old pair
+            self._map = None
+            self.generation = generation
+            self.vectors_path, self.records_path = vectors_path, records_path
+            self._save_meta()
+            for path in old_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+            ids = [self._ids[row] for row in live_rows]
+            documents = [self._documents[row] for row in live_rows]
+            metadatas = [self._metadatas[row] for row in live_rows]
+            self._rows = {memory_id: row for row, memory_id in enumerate(ids)}
+            self._ids, self._documents, self._metadatas = ids, documents, metadatas
+            self._row_count = len(live_rows)
+            self._alive = np.zeros(0, dtype=bool)
+            self._columns = {}
+            self._ensure_capacity(self._row_count)
+            self._alive[:self._row_count] = True
+
+    def close(self):
+        with self._lock:
+            if self._row_count - len(self._rows) > 0:
+                self.compact()
+            self._map = None
+
+
+_RANGE_OPS = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+
+
+def _as_number(value):
+    return float(value) if isinstance(value, (int, float)) else np.nan
+
+
+def matches_where(metadata, where):
+    """Evaluate a Chroma-style where clause against one metadata dict."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, target in condition.items():
+                if not _compare(value, op, target):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _compare(value, op, target):
+    if op == "$eq":
+        return value == target
+    if op == "$ne":
+        return value != target
+    if op == "$in":
+        return value in target
+    if op == "$nin":
+        return value not in target
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > target
+        if op == "$gte":
+            return value >= target
+        if op == "$lt":
+            return value < target
+        if op == "$lte":
+            return value <= target
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported where operator: {op}")
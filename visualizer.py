@@ -84,14 +84,13 @@ class MemoryVisualizer(QWidget):
 
         # Get all memories
         all_topics = {}
-        memories = self.memory_manager.collection.get()
+        memories = self.memory_manager.iter_memories(self.memory_manager.collection, include=["metadatas"])
 
         # Count topic frequencies
-        for metadata in memories.get("metadatas", []):
-            if metadata:
-                for key, value in metadata.items():
-                    if key.startswith("topic_"):
-                        all_topics[value] = all_topics.get(value, 0) + 1
+        for memory in memories:
+            for key, value in memory["metadata"].items():
+                if key.startswith("topic_"):
+                    all_topics[value] = all_topics.get(value, 0) + 1
 
         # Get top N topics
         top_topics = sorted(all_topics.items(), key=lambda x: x[1], reverse=True)[:top_n]